@@ -4,12 +4,79 @@ Maps custom chat names to real Claude Code session IDs.
 """
 
 import sqlite3
-import os
+import threading
+from collections import Counter
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Iterable, Tuple
 from datetime import datetime
 
 
+# SQL is kept as module constants so the connection's statement cache is reused.
+# The table is small but hot for a long-running processor: keep it in an 8 MB
+# page cache and read it through a 128 MB mmap window instead of pread().
+PRAGMAS_SQL = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-8000;
+    PRAGMA mmap_size=134217728;
+"""
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_name TEXT UNIQUE NOT NULL,
+        session_id TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        total_prompts INTEGER DEFAULT 0,
+        working_directory TEXT DEFAULT '.'
+    )
+"""
+
+# Covering index so session ID lookups by chat name never touch the table
+CREATE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_chat_name_sid
+    ON chat_sessions(chat_name, session_id)
+"""
+
+# Resolves the chat a completed prompt belongs to
+CREATE_SESSION_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_session_id_name
+    ON chat_sessions(session_id, chat_name)
+"""
+
+SAVE_SQL = """
+    INSERT OR REPLACE INTO chat_sessions
+    (chat_name, session_id, working_directory, created_at, last_used)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# The planner prefers the UNIQUE autoindex for equality lookups, so name the
+# covering index explicitly to keep the lookup index-only
+GET_SESSION_ID_SQL = """
+    SELECT session_id FROM chat_sessions INDEXED BY idx_chat_name_sid
+    WHERE chat_name = ?
+"""
+
+GET_CHAT_NAME_SQL = """
+    SELECT chat_name FROM chat_sessions INDEXED BY idx_session_id_name
+    WHERE session_id = ? LIMIT 1
+"""
+
+EXISTS_SQL = "SELECT 1 FROM chat_sessions WHERE chat_name = ? LIMIT 1"
+
+UPDATE_LAST_USED_SQL = """
+    UPDATE chat_sessions
+    SET last_used = ?, total_prompts = total_prompts + ?
+    WHERE chat_name = ?
+"""
+
+LIST_SQL = "SELECT * FROM chat_sessions ORDER BY last_used DESC"
+
+DELETE_SQL = "DELETE FROM chat_sessions WHERE chat_name = ?"
+
+
 class ChatSessionManager:
     """Manages mapping between chat names and Claude Code session IDs."""
     
@@ -17,78 +84,140 @@ class ChatSessionManager:
         self.storage_dir = Path(storage_dir).expanduser()
         self.db_path = self.storage_dir / "chat_sessions.db"
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        # One autocommit connection for the lifetime of the manager; the lock
+        # serializes access from the queue processor and its callers.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        # chat_name -> session_id for names already resolved by this process
+        self._sid_cache: Dict[str, str] = {}
+        # session_id -> chat_name, the reverse lookup; misses are not cached
+        # because another process may add the chat later
+        self._name_cache: Dict[str, str] = {}
+        # Prompt counts not yet written by flush_bumps()
+        self._pending_bumps: Counter = Counter()
+        self._pending_last_used: Dict[str, datetime] = {}
         self._init_database()
     
     def _init_database(self):
         """Initialize the SQLite database."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS chat_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    chat_name TEXT UNIQUE NOT NULL,
-                    session_id TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    total_prompts INTEGER DEFAULT 0,
-                    working_directory TEXT DEFAULT '.'
-                )
-            """)
-            conn.commit()
+        with self._lock:
+            self._conn.executescript(PRAGMAS_SQL)
+            self._conn.execute(CREATE_TABLE_SQL)
+            self._conn.execute(CREATE_INDEX_SQL)
+            self._conn.execute(CREATE_SESSION_INDEX_SQL)
+    
+    def close(self) -> None:
+        """Flush pending updates and close the database connection."""
+        self.flush_bumps()
+        with self._lock:
+            self._conn.close()
     
     def save_chat_session(self, chat_name: str, session_id: str, working_directory: str = ".") -> bool:
         """Save a chat name to session ID mapping."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO chat_sessions 
-                    (chat_name, session_id, working_directory, created_at, last_used)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (chat_name, session_id, working_directory, datetime.now(), datetime.now()))
-                conn.commit()
+            now = datetime.now()
+            with self._lock:
+                self._conn.execute(
+                    SAVE_SQL, (chat_name, session_id, working_directory, now, now)
+                )
+                self._sid_cache[chat_name] = session_id
+                self._name_cache[session_id] = chat_name
             return True
         except Exception as e:
             print(f"Error saving chat session: {e}")
             return False
     
+    def save_many(self, sessions: Iterable[Tuple[str, str, str]]) -> bool:
+        """Save (chat_name, session_id, working_directory) mappings in one transaction."""
+        now = datetime.now()
+        rows = [
+            (chat_name, session_id, working_directory, now, now)
+            for chat_name, session_id, working_directory in sessions
+        ]
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(SAVE_SQL, rows)
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                self._conn.execute("ROLLBACK")
+                print(f"Error saving chat sessions: {e}")
+                return False
+            for chat_name, session_id, _, _, _ in rows:
+                self._sid_cache[chat_name] = session_id
+                self._name_cache[session_id] = chat_name
+        return True
+    
     def get_session_id(self, chat_name: str) -> Optional[str]:
         """Get the Claude Code session ID for a chat name."""
+        session_id = self._sid_cache.get(chat_name)
+        if session_id is not None:
+            return session_id
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("""
-                    SELECT session_id FROM chat_sessions 
-                    WHERE chat_name = ?
-                """, (chat_name,))
-                result = cursor.fetchone()
-                return result[0] if result else None
+            with self._lock:
+                result = self._conn.execute(GET_SESSION_ID_SQL, (chat_name,)).fetchone()
+                if result:
+                    self._sid_cache[chat_name] = result[0]
+            return result[0] if result else None
         except Exception as e:
             print(f"Error getting session ID: {e}")
             return None
     
-    def update_last_used(self, chat_name: str) -> bool:
-        """Update the last used timestamp for a chat."""
+    def get_chat_name(self, session_id: str) -> Optional[str]:
+        """Get the chat name a Claude Code session ID belongs to."""
+        chat_name = self._name_cache.get(session_id)
+        if chat_name is not None:
+            return chat_name
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    UPDATE chat_sessions 
-                    SET last_used = ?, total_prompts = total_prompts + 1
-                    WHERE chat_name = ?
-                """, (datetime.now(), chat_name))
-                conn.commit()
-            return True
+            with self._lock:
+                result = self._conn.execute(GET_CHAT_NAME_SQL, (session_id,)).fetchone()
+                if result:
+                    self._name_cache[session_id] = result[0]
+            return result[0] if result else None
         except Exception as e:
-            print(f"Error updating last used: {e}")
-            return False
+            print(f"Error getting chat name: {e}")
+            return None
+    
+    def update_last_used(self, chat_name: str) -> bool:
+        """Record a use of a chat; written to the database by flush_bumps()."""
+        with self._lock:
+            self._pending_bumps[chat_name] += 1
+            self._pending_last_used[chat_name] = datetime.now()
+        return True
+    
+    def flush_bumps(self) -> bool:
+        """Write pending last-used timestamps and prompt counts in one batch."""
+        with self._lock:
+            if not self._pending_bumps:
+                return True
+            rows = [
+                (self._pending_last_used[chat_name], count, chat_name)
+                for chat_name, count in self._pending_bumps.items()
+            ]
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(UPDATE_LAST_USED_SQL, rows)
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                self._conn.execute("ROLLBACK")
+                print(f"Error updating last used: {e}")
+                return False
+            self._pending_bumps.clear()
+            self._pending_last_used.clear()
+        return True
     
-    def list_chat_sessions(self) -> List[Dict[str, Any]]:
-        """List all chat sessions."""
+    def list_chat_sessions(self) -> List[sqlite3.Row]:
+        """List all chat sessions as rows supporting key and index access."""
+        self.flush_bumps()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.execute("""
-                    SELECT * FROM chat_sessions 
-                    ORDER BY last_used DESC
-                """)
-                return [dict(row) for row in cursor.fetchall()]
+            with self._lock:
+                cursor = self._conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                return cursor.execute(LIST_SQL).fetchall()
         except Exception as e:
             print(f"Error listing chat sessions: {e}")
             return []
@@ -96,16 +225,25 @@ class ChatSessionManager:
     def delete_chat_session(self, chat_name: str) -> bool:
         """Delete a chat session."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("""
-                    DELETE FROM chat_sessions WHERE chat_name = ?
-                """, (chat_name,))
-                conn.commit()
-                return cursor.rowcount > 0
+            with self._lock:
+                cursor = self._conn.execute(DELETE_SQL, (chat_name,))
+                self._sid_cache.pop(chat_name, None)
+                for session_id in [
+                    sid for sid, name in self._name_cache.items() if name == chat_name
+                ]:
+                    del self._name_cache[session_id]
+                self._pending_bumps.pop(chat_name, None)
+                self._pending_last_used.pop(chat_name, None)
+            return cursor.rowcount > 0
         except Exception as e:
             print(f"Error deleting chat session: {e}")
             return False
     
     def chat_exists(self, chat_name: str) -> bool:
         """Check if a chat session exists."""
-        return self.get_session_id(chat_name) is not None
\ No newline at end of file
+        try:
+            with self._lock:
+                return self._conn.execute(EXISTS_SQL, (chat_name,)).fetchone() is not None
+        except Exception as e:
+            print(f"Error checking chat session: {e}")
+            return False
\ No newline at end of file
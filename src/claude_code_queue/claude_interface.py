@@ -3,25 +3,67 @@ Interface for executing prompts via Claude Code CLI.
 """
 
 import os
+import re
+import shutil
+import signal
 import subprocess
+import threading
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Any, Dict, Optional, List, Set, Tuple
 
 from .models import ExecutionResult, RateLimitInfo, QueuedPrompt
 
+# Rate limit messages ("limit exceeded" also matches "rate limit exceeded").
+# Group 1 is Claude's own usage limit message, which carries the reset time.
+_USAGE_LIMIT_RE = re.compile(r"usage limit reached", re.IGNORECASE)
+_LIMIT_RE = re.compile(
+    r"(usage limit reached)|limit exceeded|too many requests|quota exceeded",
+    re.IGNORECASE,
+)
+
+# "Claude usage limit reached|<unix timestamp of the reset>"
+_RESET_TIMESTAMP_RE = re.compile(r"usage limit reached\|(\d+)", re.IGNORECASE)
+_ISO_TIMESTAMP_RE = re.compile(
+    r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})?)"
+)
+
 
 class ClaudeCodeInterface:
     """Interface for executing prompts via Claude Code CLI."""
 
-    def __init__(self, claude_command: str = "claude", timeout: int = 3600):
+    # Only this much of a prompt's output is kept in memory and in its log
+    OUTPUT_TAIL_BYTES = 4096
+
+    # Claude commands already verified by this process
+    _verified: Set[str] = set()
+
+    def __init__(
+        self,
+        claude_command: str = "claude",
+        timeout: int = 3600,
+        output_dir: Optional[Path] = None,
+        verify: bool = True,
+    ):
         self.claude_command = claude_command
         self.timeout = timeout
-        self._verify_claude_available()
+        self.output_dir = output_dir
+        # Claude processes currently running, so shutdown can stop them
+        self._running: Set[subprocess.Popen] = set()
+        self._running_lock = threading.Lock()
+        if verify:
+            self._verify_claude_available()
 
     def _verify_claude_available(self) -> None:
         """Verify Claude Code CLI is available."""
+        if self.claude_command in ClaudeCodeInterface._verified:
+            return
+        if shutil.which(self.claude_command) is None:
+            raise RuntimeError(
+                f"Claude Code CLI not found. Make sure '{self.claude_command}' is in PATH."
+            )
+
         try:
             result = subprocess.run(
                 [self.claude_command, "--version"],
@@ -31,6 +73,7 @@ class ClaudeCodeInterface:
             )
             if result.returncode != 0:
                 raise RuntimeError(f"Claude Code CLI not available: {result.stderr}")
+            ClaudeCodeInterface._verified.add(self.claude_command)
         except FileNotFoundError:
             raise RuntimeError(
                 f"Claude Code CLI not found. Make sure '{self.claude_command}' is in PATH."
@@ -38,6 +81,93 @@ class ClaudeCodeInterface:
         except subprocess.TimeoutExpired:
             raise RuntimeError("Claude Code CLI verification timed out.")
 
+    def output_path_for(self, prompt: QueuedPrompt) -> Optional[Path]:
+        """File that receives a prompt's full output, if output files are enabled."""
+        if self.output_dir is None:
+            return None
+        return self.output_dir / f"{prompt.id}.log"
+
+    def _run(self, cmd: List[str], working_dir: Path, **kwargs: Any) -> subprocess.CompletedProcess:
+        """Like subprocess.run(), but the child can be stopped by terminate_running().
+
+        The child gets its own session, so a Ctrl+C meant for the queue
+        processor does not also kill the running prompt.
+        """
+        with subprocess.Popen(
+            cmd, cwd=str(working_dir), start_new_session=True, **kwargs
+        ) as process:
+            with self._running_lock:
+                self._running.add(process)
+            try:
+                stdout, stderr = process.communicate(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                raise
+            finally:
+                with self._running_lock:
+                    self._running.discard(process)
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    def terminate_running(self) -> int:
+        """Send SIGTERM to every running Claude process and its children.
+
+        Returns how many were running.
+        """
+        with self._running_lock:
+            processes = list(self._running)
+        for process in processes:
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(process.pid, signal.SIGTERM)
+                else:
+                    process.terminate()
+            except OSError:
+                pass
+        return len(processes)
+
+    @staticmethod
+    def working_dir_for(prompt: QueuedPrompt) -> Path:
+        """Resolve a prompt's working directory, creating it if needed.
+
+        The directory is passed to the child as cwd=; this process never
+        changes its own working directory.
+        """
+        working_dir = Path(prompt.working_directory).resolve()
+        working_dir.mkdir(parents=True, exist_ok=True)
+        return working_dir
+
+    def run_cli(
+        self, cmd: List[str], working_dir: Path, output_path: Optional[Path] = None
+    ) -> subprocess.CompletedProcess:
+        """Run a Claude CLI command in working_dir.
+
+        With an output_path the child writes stdout straight to that file and
+        only its last OUTPUT_TAIL_BYTES are read back as the result's stdout.
+
+        Every call starts a new process. `claude --print` answers one prompt
+        and exits; there is no stdin protocol that marks where one answer
+        ends, so a long-lived process cannot be shared between prompts.
+        Sessions continue across processes through --resume.
+        """
+        if output_path is None:
+            return self._run(
+                cmd, working_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+
+        with open(output_path, "w+b") as output_file:
+            result = self._run(cmd, working_dir, stdout=output_file, stderr=subprocess.PIPE)
+            size = output_file.seek(0, os.SEEK_END)
+            output_file.seek(max(size - self.OUTPUT_TAIL_BYTES, 0))
+            stdout = output_file.read().decode("utf-8", errors="replace")
+
+        if size > self.OUTPUT_TAIL_BYTES:
+            # Drop the partial first line
+            stdout = stdout.partition("\n")[2]
+
+        return subprocess.CompletedProcess(
+            cmd, result.returncode, stdout, result.stderr.decode("utf-8", errors="replace")
+        )
+
     def execute_prompt(self, prompt: QueuedPrompt) -> ExecutionResult:
         """Execute a prompt via Claude Code CLI."""
         start_time = time.time()
@@ -46,13 +176,7 @@ class ClaudeCodeInterface:
     def _execute_with_cli(self, prompt: QueuedPrompt, start_time: float) -> ExecutionResult:
         """Execute prompt using Claude CLI."""
         try:
-            original_cwd = os.getcwd()
-
-            working_dir = Path(prompt.working_directory).resolve()
-            if not working_dir.exists():
-                working_dir.mkdir(parents=True, exist_ok=True)
-
-            os.chdir(working_dir)
+            working_dir = self.working_dir_for(prompt)
 
             cmd = [
                 self.claude_command,
@@ -67,22 +191,20 @@ class ClaudeCodeInterface:
             full_prompt = prompt.content
 
             if prompt.context_files:
-                context_refs = []
-                for context_file in prompt.context_files:
-                    context_path = Path(context_file)  # Relative to working directory
-                    if context_path.exists():
-                        context_refs.append(f"@{context_file}")
+                context_refs = [
+                    f"@{context_file}"
+                    for context_file in self._existing_context_files(
+                        working_dir, prompt.context_files
+                    )
+                ]
 
                 if context_refs:
                     full_prompt = f"{' '.join(context_refs)} {prompt.content}"
 
             cmd.append(full_prompt)
 
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, timeout=self.timeout
-            )
-
-            os.chdir(original_cwd)
+            output_path = self.output_path_for(prompt)
+            result = self.run_cli(cmd, working_dir, output_path)
 
             execution_time = time.time() - start_time
 
@@ -96,13 +218,10 @@ class ClaudeCodeInterface:
                 error=result.stderr,
                 rate_limit_info=rate_limit_info,
                 execution_time=execution_time,
+                output_path=str(output_path) if output_path else None,
             )
 
         except subprocess.TimeoutExpired:
-            try:
-                os.chdir(original_cwd)
-            except:
-                pass
             execution_time = time.time() - start_time
             return ExecutionResult(
                 success=False,
@@ -111,10 +230,6 @@ class ClaudeCodeInterface:
                 execution_time=execution_time,
             )
         except Exception as e:
-            try:
-                os.chdir(original_cwd)
-            except:
-                pass
             execution_time = time.time() - start_time
             return ExecutionResult(
                 success=False,
@@ -123,46 +238,61 @@ class ClaudeCodeInterface:
                 execution_time=execution_time,
             )
 
+    @staticmethod
+    def _existing_context_files(working_dir: Path, context_files: List[str]) -> List[str]:
+        """Return the context files that exist under working_dir, in order.
+
+        Directories holding several of the files are listed once with scandir
+        instead of stat()ing each file.
+        """
+        by_parent: Dict[Path, List[str]] = {}
+        for context_file in context_files:
+            by_parent.setdefault((working_dir / context_file).parent, []).append(context_file)
+
+        existing: Set[str] = set()
+        for parent, files in by_parent.items():
+            if len(files) == 1:
+                if (working_dir / files[0]).exists():
+                    existing.add(files[0])
+                continue
+            try:
+                with os.scandir(parent) as entries:
+                    names = {entry.name for entry in entries}
+            except OSError:
+                continue
+            existing.update(f for f in files if (working_dir / f).name in names)
+
+        return [f for f in context_files if f in existing]
+
     def _detect_rate_limit(self, output: str) -> RateLimitInfo:
         """Detect rate limiting from Claude Code output."""
-        output_lower = output.lower()
-
-        # Common rate limit patterns
-        rate_limit_patterns = [
-            ("usage limit reached", self._extract_reset_time_from_limit_message),
-            ("rate limit exceeded", self._estimate_reset_time),
-            ("too many requests", self._estimate_reset_time),
-            ("quota exceeded", self._estimate_reset_time),
-            ("limit exceeded", self._estimate_reset_time),
-        ]
-
-        for pattern, reset_extractor in rate_limit_patterns:
-            if pattern in output_lower:
-                reset_time = reset_extractor(output)
-                return RateLimitInfo(
-                    is_rate_limited=True,
-                    reset_time=reset_time,
-                    limit_message=output.strip()[:500],  # First 500 chars
-                    timestamp=datetime.now(),
-                )
-
-        return RateLimitInfo(is_rate_limited=False)
+        match = _LIMIT_RE.search(output)
+        if match is None:
+            return RateLimitInfo(is_rate_limited=False)
+
+        # Claude's own message wins wherever it appears, so look past a
+        # generic match for it
+        if match.group(1) or _USAGE_LIMIT_RE.search(output, match.end()):
+            reset_time = self._extract_reset_time_from_limit_message(output)
+        else:
+            reset_time = self._estimate_reset_time(output)
+
+        return RateLimitInfo(
+            is_rate_limited=True,
+            reset_time=reset_time,
+            limit_message=output.strip()[:500],  # First 500 chars
+            timestamp=datetime.now(),
+        )
 
     def _extract_reset_time_from_limit_message(self, output: str) -> Optional[datetime]:
         """Extract reset time from Claude's limit message."""
         try:
-            import re
-
-            pattern1 = r"usage limit reached\|(\d+)"
-            match1 = re.search(pattern1, output, re.IGNORECASE)
+            match1 = _RESET_TIMESTAMP_RE.search(output)
             if match1:
                 timestamp = int(match1.group(1))
                 return datetime.fromtimestamp(timestamp)
 
-            pattern2 = (
-                r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})?)"
-            )
-            matches = re.findall(pattern2, output)
+            matches = _ISO_TIMESTAMP_RE.findall(output)
             if matches:
                 latest_time = None
                 for match in matches:
@@ -171,6 +301,9 @@ class ClaudeCodeInterface:
                             ts = datetime.fromisoformat(match.replace("Z", "+00:00"))
                         else:
                             ts = datetime.fromisoformat(match)
+                        if ts.tzinfo is not None:
+                            # Scheduling compares against naive local times
+                            ts = ts.astimezone().replace(tzinfo=None)
 
                         if latest_time is None or ts > latest_time:
                             latest_time = ts
@@ -6,18 +6,47 @@ A tool to queue Claude Code prompts and automatically execute them when token li
 """
 
 import argparse
+import functools
 import json
+import sys
 from datetime import datetime
-
-from .queue_manager import QueueManager
-from .models import QueuedPrompt, PromptStatus
-
-
-def main():
-    parser = argparse.ArgumentParser(
-        description="Claude Code Queue - Queue prompts and execute when limits reset",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .queue_manager import QueueManager
+
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+    # Same bytes as the orjson path: UTF-8 rather than \u escapes
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+
+# Mirrors PromptStatus values so the parser can be built without importing models
+_STATUS_CHOICES = (
+    "queued",
+    "executing",
+    "completed",
+    "failed",
+    "cancelled",
+    "rate_limited",
+)
+
+# Keyed by status value for the same reason
+_STATUS_ICON = {
+    "queued": "⏳",
+    "executing": "▶️",
+    "completed": "✅",
+    "failed": "❌",
+    "cancelled": "🚫",
+    "rate_limited": "⚠️",
+}
+
+_EPILOG = """
 Examples:
   # Start the queue processor
   python -m claude_code_queue.cli start
@@ -36,7 +65,25 @@ Examples:
 
   # Test Claude Code connection  
   python -m claude_code_queue.cli test
-        """,
+        """
+
+
+def _parser_options() -> dict:
+    """Extra ArgumentParser options for the running Python version."""
+    if sys.version_info >= (3, 14):
+        # argparse checks for colour support on every add_argument call; skip
+        # that when help output is not going to a terminal
+        return {"color": sys.stdout.isatty()}
+    return {}
+
+
+def main():
+    parser_options = _parser_options()
+    parser = argparse.ArgumentParser(
+        description="Claude Code Queue - Queue prompts and execute when limits reset",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG,
+        **parser_options,
     )
 
     parser.add_argument(
@@ -65,13 +112,82 @@ Examples:
         help="Command timeout in seconds (default: 3600)",
     )
 
-    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    subparsers = parser.add_subparsers(
+        dest="command",
+        help="Available commands",
+        parser_class=functools.partial(argparse.ArgumentParser, **parser_options),
+    )
+
+    # Only build the subparser that will actually be used; building all of
+    # them is only needed for top-level help and error messages.
+    command = _peek_command(sys.argv[1:])
+    if command is None:
+        for build_parser in _SUBPARSER_BUILDERS.values():
+            build_parser(subparsers)
+    else:
+        _SUBPARSER_BUILDERS[command](subparsers)
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return 1
+
+    try:
+        from .queue_manager import QueueManager
 
+        manager = QueueManager(
+            storage_dir=args.storage_dir,
+            claude_command=args.claude_command,
+            check_interval=args.check_interval,
+            timeout=args.timeout,
+        )
+
+        if args.command == "start":
+            return cmd_start(manager, args)
+        elif args.command == "add":
+            return cmd_add(manager, args)   
+        elif args.command == "template":
+            return cmd_template(manager, args)
+        elif args.command == "status":
+            return cmd_status(manager, args)
+        elif args.command == "cancel":
+            return cmd_cancel(manager, args)
+        elif args.command == "list":
+            return cmd_list(manager, args)
+        elif args.command == "create-chat":
+            return cmd_create_chat(manager, args)
+        elif args.command == "list-chats":
+            return cmd_list_chats(manager, args)
+        elif args.command == "test":
+            return cmd_test(manager, args)
+        else:
+            print(f"Unknown command: {args.command}")
+            return 1
+
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+        return 130
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+def _build_start_parser(subparsers) -> None:
     start_parser = subparsers.add_parser("start", help="Start the queue processor")
     start_parser.add_argument(
         "--verbose", "-v", action="store_true", help="Verbose output"
     )
+    start_parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Number of prompts to run at once (prompts of one chat never overlap)",
+    )
+
 
+def _build_add_parser(subparsers) -> None:
     add_parser = subparsers.add_parser("add", help="Add a prompt to the queue")
     add_parser.add_argument("prompt", help="The prompt text")
     add_parser.add_argument(
@@ -100,6 +216,8 @@ Examples:
         "--chat-name", "-c", type=str, help="Chat name to add prompt to (searches for session ID automatically)"
     )
 
+
+def _build_template_parser(subparsers) -> None:
     template_parser = subparsers.add_parser(
         "template", help="Create a prompt template file"
     )
@@ -110,21 +228,29 @@ Examples:
         "--priority", "-p", type=int, default=0, help="Default priority"
     )
 
+
+def _build_status_parser(subparsers) -> None:
     status_parser = subparsers.add_parser("status", help="Show queue status")
     status_parser.add_argument("--json", action="store_true", help="Output as JSON")
     status_parser.add_argument(
         "--detailed", "-d", action="store_true", help="Show detailed prompt info"
     )
 
+
+def _build_cancel_parser(subparsers) -> None:
     cancel_parser = subparsers.add_parser("cancel", help="Cancel a prompt")
     cancel_parser.add_argument("prompt_id", help="Prompt ID to cancel")
 
+
+def _build_list_parser(subparsers) -> None:
     list_parser = subparsers.add_parser("list", help="List prompts")
     list_parser.add_argument(
-        "--status", choices=[s.value for s in PromptStatus], help="Filter by status"
+        "--status", choices=_STATUS_CHOICES, help="Filter by status"
     )
     list_parser.add_argument("--json", action="store_true", help="Output as JSON")
 
+
+def _build_create_chat_parser(subparsers) -> None:
     create_chat_parser = subparsers.add_parser("create-chat", help="Create a new Claude Code chat session")
     create_chat_parser.add_argument("name", help="Name for the chat session")
     create_chat_parser.add_argument("initial_prompt", help="Initial prompt to start the conversation")
@@ -135,56 +261,87 @@ Examples:
         "--working-dir", "-d", default=".", help="Working directory"
     )
 
+
+def _build_list_chats_parser(subparsers) -> None:
     list_chats_parser = subparsers.add_parser("list-chats", help="List active chat sessions")
     list_chats_parser.add_argument("--json", action="store_true", help="Output as JSON")
 
-    test_parser = subparsers.add_parser("test", help="Test Claude Code connection")
 
-    args = parser.parse_args()
+def _build_test_parser(subparsers) -> None:
+    subparsers.add_parser("test", help="Test Claude Code connection")
 
-    if not args.command:
-        parser.print_help()
-        return 1
 
-    try:
-        manager = QueueManager(
-            storage_dir=args.storage_dir,
-            claude_command=args.claude_command,
-            check_interval=args.check_interval,
-            timeout=args.timeout,
-        )
+_SUBPARSER_BUILDERS = {
+    "start": _build_start_parser,
+    "add": _build_add_parser,
+    "template": _build_template_parser,
+    "status": _build_status_parser,
+    "cancel": _build_cancel_parser,
+    "list": _build_list_parser,
+    "create-chat": _build_create_chat_parser,
+    "list-chats": _build_list_chats_parser,
+    "test": _build_test_parser,
+}
 
-        if args.command == "start":
-            return cmd_start(manager, args)
-        elif args.command == "add":
-            return cmd_add(manager, args)   
-        elif args.command == "template":
-            return cmd_template(manager, args)
-        elif args.command == "status":
-            return cmd_status(manager, args)
-        elif args.command == "cancel":
-            return cmd_cancel(manager, args)
-        elif args.command == "list":
-            return cmd_list(manager, args)
-        elif args.command == "create-chat":
-            return cmd_create_chat(manager, args)
-        elif args.command == "list-chats":
-            return cmd_list_chats(manager, args)
-        elif args.command == "test":
-            return cmd_test(manager, args)
-        else:
-            print(f"Unknown command: {args.command}")
-            return 1
+# Global options that consume the following argument as their value
+_GLOBAL_VALUE_OPTIONS = frozenset(
+    ["--storage-dir", "--claude-command", "--check-interval", "--timeout"]
+)
 
-    except KeyboardInterrupt:
-        print("\nInterrupted by user")
-        return 130
-    except Exception as e:
-        print(f"Error: {e}")
-        return 1
+
+def _peek_command(argv) -> Optional[str]:
+    """Return the subcommand named in argv, or None if there isn't a known one."""
+    args = iter(argv)
+    for arg in args:
+        if arg in _GLOBAL_VALUE_OPTIONS:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg if arg in _SUBPARSER_BUILDERS else None
+    return None
+
+
+def _truncate(text: str, width: int) -> str:
+    """Cut text to width characters, marking the cut with an ellipsis."""
+    return text if len(text) <= width else text[:width] + "..."
+
+
+def _format_timestamp(dt: datetime) -> str:
+    """Format a datetime as YYYY-MM-DD HH:MM:SS without going through strftime."""
+    return dt.isoformat(sep=" ", timespec="seconds")
+
+
+def _format_iso_timestamp(value: str) -> str:
+    """Format a naive ISO timestamp string like _format_timestamp, without parsing it."""
+    # "YYYY-MM-DDTHH:MM:SS", optionally with ".ffffff"
+    if len(value) in (19, 26) and value[10] == "T":
+        return f"{value[:10]} {value[11:19]}"
+    return _format_timestamp(datetime.fromisoformat(value))
 
 
-def cmd_start(manager: QueueManager, args) -> int:
+def _stdout_buffer():
+    """The stdout byte buffer, after flushing any text already printed."""
+    sys.stdout.flush()
+    return sys.stdout.buffer
+
+
+def _write_json(obj) -> None:
+    """Write obj to stdout as indented JSON."""
+    _stdout_buffer().write(_json_dumps(obj) + b"\n")
+
+
+def _write_json_array(items) -> None:
+    """Write items to stdout as an indented JSON array, one element at a time."""
+    write = _stdout_buffer().write
+    first = True
+    for item in items:
+        write(b"[\n  " if first else b",\n  ")
+        # Encoded JSON has no raw newlines inside strings, so this only indents
+        write(_json_dumps(item).replace(b"\n", b"\n  "))
+        first = False
+    write(b"[]\n" if first else b"\n]\n")
+
+
+def cmd_start(manager: "QueueManager", args) -> int:
     """Start the queue processor."""
 
     def status_callback(state):
@@ -192,13 +349,17 @@ def cmd_start(manager: QueueManager, args) -> int:
             stats = state.get_stats()
             print(f"Queue status: {stats['status_counts']}")
 
-    manager.start(callback=status_callback if args.verbose else None)
+    manager.start(
+        callback=status_callback if args.verbose else None,
+        max_workers=args.workers,
+    )
     return 0
 
 
-def cmd_add(manager: QueueManager, args) -> int:
+def cmd_add(manager: "QueueManager", args) -> int:
     """Add a prompt to the queue."""
-    
+    from .models import QueuedPrompt
+
     # Resolve session_id from chat name if provided
     session_id = getattr(args, 'session', None)
     chat_name = getattr(args, 'chat_name', None)
@@ -225,13 +386,15 @@ def cmd_add(manager: QueueManager, args) -> int:
         max_retries=args.max_retries,
         estimated_tokens=args.estimated_tokens,
         session_id=session_id,
+        chat_name=chat_name,
     )
 
     success = manager.add_prompt(prompt)
+    manager.chat_sessions.flush_bumps()
     return 0 if success else 1
 
 
-def cmd_template(manager: QueueManager, args) -> int:
+def cmd_template(manager: "QueueManager", args) -> int:
     """Create a prompt template file."""
     file_path = manager.create_prompt_template(args.filename, args.priority)
     print(f"Created template: {file_path}")
@@ -239,13 +402,13 @@ def cmd_template(manager: QueueManager, args) -> int:
     return 0
 
 
-def cmd_status(manager: QueueManager, args) -> int:
+def cmd_status(manager: "QueueManager", args) -> int:
     """Show queue status."""
     state = manager.get_status()
     stats = state.get_stats()
 
     if args.json:
-        print(json.dumps(stats, indent=2))
+        _write_json(stats)
         return 0
 
     print("Claude Code Queue Status")
@@ -256,8 +419,7 @@ def cmd_status(manager: QueueManager, args) -> int:
     print(f"Rate limited count: {stats['rate_limited_count']}")
 
     if stats["last_processed"]:
-        last_processed = datetime.fromisoformat(stats["last_processed"])
-        print(f"Last processed: {last_processed.strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"Last processed: {_format_iso_timestamp(stats['last_processed'])}")
 
     print("\nStatus breakdown:")
     for status, count in stats["status_counts"].items():
@@ -267,65 +429,56 @@ def cmd_status(manager: QueueManager, args) -> int:
     if stats["current_rate_limit"]["is_rate_limited"]:
         reset_time = stats["current_rate_limit"]["reset_time"]
         if reset_time:
-            reset_dt = datetime.fromisoformat(reset_time)
-            print(f"\nRate limited until: {reset_dt.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"\nRate limited until: {_format_iso_timestamp(reset_time)}")
 
     if args.detailed and state.prompts:
         print("\nPrompts:")
         print("-" * 40)
-        for prompt in sorted(state.prompts, key=lambda p: p.priority):
-            status_icon = {
-                PromptStatus.QUEUED: "⏳",
-                PromptStatus.EXECUTING: "▶️",
-                PromptStatus.COMPLETED: "✅",
-                PromptStatus.FAILED: "❌",
-                PromptStatus.CANCELLED: "🚫",
-                PromptStatus.RATE_LIMITED: "⚠️",
-            }.get(prompt.status, "❓")
-
-            print(
-                f"{status_icon} {prompt.id} (P{prompt.priority}) - {prompt.status.value}"
-            )
-            print(
-                f"   {prompt.content[:80]}{'...' if len(prompt.content) > 80 else ''}"
+        out = []
+        # state.prompts is kept in priority order
+        for prompt in state.prompts:
+            status_icon = _STATUS_ICON.get(prompt.status.value, "❓")
+
+            out.append(
+                f"{status_icon} {prompt.id} (P{prompt.priority}) - {prompt.status.value}\n"
+                f"   {_truncate(prompt.content, 80)}\n"
             )
             if prompt.retry_count > 0:
-                print(f"   Retries: {prompt.retry_count}/{prompt.max_retries}")
+                out.append(f"   Retries: {prompt.retry_count}/{prompt.max_retries}\n")
+        sys.stdout.write("".join(out))
 
     return 0
 
 
-def cmd_cancel(manager: QueueManager, args) -> int:
+def cmd_cancel(manager: "QueueManager", args) -> int:
     """Cancel a prompt."""
     success = manager.remove_prompt(args.prompt_id)
     return 0 if success else 1
 
 
-def cmd_list(manager: QueueManager, args) -> int:
+def cmd_list(manager: "QueueManager", args) -> int:
     """List prompts."""
     state = manager.get_status()
     prompts = state.prompts
 
     if args.status:
-        status_filter = PromptStatus(args.status)
-        prompts = [p for p in prompts if p.status == status_filter]
+        # args.status is already validated against _STATUS_CHOICES
+        prompts = [p for p in prompts if p.status.value == args.status]
 
     if args.json:
-        prompt_data = []
-        for prompt in prompts:
-            prompt_data.append(
-                {
-                    "id": prompt.id,
-                    "content": prompt.content,
-                    "status": prompt.status.value,
-                    "priority": prompt.priority,
-                    "working_directory": prompt.working_directory,
-                    "created_at": prompt.created_at.isoformat(),
-                    "retry_count": prompt.retry_count,
-                    "max_retries": prompt.max_retries,
-                }
-            )
-        print(json.dumps(prompt_data, indent=2))
+        _write_json_array(
+            {
+                "id": prompt.id,
+                "content": prompt.content,
+                "status": prompt.status.value,
+                "priority": prompt.priority,
+                "working_directory": prompt.working_directory,
+                "created_at": prompt.created_at.isoformat(),
+                "retry_count": prompt.retry_count,
+                "max_retries": prompt.max_retries,
+            }
+            for prompt in prompts
+        )
     else:
         if not prompts:
             print("No prompts found")
@@ -333,28 +486,21 @@ def cmd_list(manager: QueueManager, args) -> int:
 
         print(f"Found {len(prompts)} prompts:")
         print("-" * 80)
-        for prompt in sorted(prompts, key=lambda p: p.priority):
-            status_icon = {
-                PromptStatus.QUEUED: "⏳",
-                PromptStatus.EXECUTING: "▶️",
-                PromptStatus.COMPLETED: "✅",
-                PromptStatus.FAILED: "❌",
-                PromptStatus.CANCELLED: "🚫",
-                PromptStatus.RATE_LIMITED: "⚠️",
-            }.get(prompt.status, "❓")
-
-            print(
-                f"{status_icon} {prompt.id} | P{prompt.priority} | {prompt.status.value}"
-            )
-            print(
-                f"   {prompt.content[:70]}{'...' if len(prompt.content) > 70 else ''}"
+        out = []
+        for prompt in prompts:
+            status_icon = _STATUS_ICON.get(prompt.status.value, "❓")
+
+            out.append(
+                f"{status_icon} {prompt.id} | P{prompt.priority} | {prompt.status.value}\n"
+                f"   {_truncate(prompt.content, 70)}\n"
+                f"   Created: {_format_timestamp(prompt.created_at)}\n"
             )
-            print(f"   Created: {prompt.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
+        sys.stdout.write("".join(out))
 
     return 0
 
 
-def cmd_create_chat(manager: QueueManager, args) -> int:
+def cmd_create_chat(manager: "QueueManager", args) -> int:
     """Create a new Claude Code chat session."""
     try:
         print(f"Creating chat session '{args.name}'...")
@@ -383,14 +529,13 @@ def cmd_create_chat(manager: QueueManager, args) -> int:
         return 1
 
 
-def cmd_list_chats(manager: QueueManager, args) -> int:
+def cmd_list_chats(manager: "QueueManager", args) -> int:
     """List active chat sessions."""
     try:
         chat_sessions = manager.chat_sessions.list_chat_sessions()
         
         if args.json:
-            import json
-            print(json.dumps(chat_sessions, indent=2, default=str))
+            _write_json([dict(session) for session in chat_sessions])
             return 0
         
         if not chat_sessions:
@@ -417,7 +562,7 @@ def cmd_list_chats(manager: QueueManager, args) -> int:
         return 1
 
 
-def cmd_test(manager: QueueManager, args) -> int:
+def cmd_test(manager: "QueueManager", args) -> int:
     """Test Claude Code connection."""
     is_working, message = manager.claude_interface.test_connection()
     print(message)
@@ -2,11 +2,45 @@
 Data structures for Claude Code Queue system.
 """
 
+from collections import Counter
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional, Dict, Any
-import uuid
+from operator import attrgetter
+from typing import List, Optional, Dict, Any, Callable, Container, Tuple
+import os
+import re
+import sys
+import time
+
+
+_BY_PRIORITY = attrgetter("priority")
+
+# Instances without a __dict__ where dataclasses support it (Python 3.10+)
+_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Temporary session IDs are "temp-<chat name>-<8 hex digits>"
+_TEMP_SESSION_RE = re.compile(r"temp-(.+)-[0-9a-f]{8}")
+
+# An execution log longer than this loses its oldest lines when rendered
+MAX_EXECUTION_LOG_CHARS = 64 * 1024
+
+# Last (second, formatted timestamp) rendered into an execution log
+_log_stamp: Tuple[int, str] = (-1, "")
+
+
+def _log_timestamp(second: int) -> str:
+    """Local time of a Unix second as used in execution logs, formatted once per second."""
+    global _log_stamp
+    if _log_stamp[0] != second:
+        _log_stamp = (second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)))
+    return _log_stamp[1]
+
+
+def chat_name_from_temp_session(session_id: Optional[str]) -> Optional[str]:
+    """Chat name embedded in a temporary session ID, or None."""
+    match = _TEMP_SESSION_RE.fullmatch(session_id or "")
+    return match.group(1) if match else None
 
 
 class PromptStatus(Enum):
@@ -20,11 +54,15 @@ class PromptStatus(Enum):
     RATE_LIMITED = "rate_limited"
 
 
-@dataclass
+# Statuses from which a prompt may be run again
+_RETRYABLE_STATUSES = frozenset((PromptStatus.FAILED, PromptStatus.RATE_LIMITED))
+
+
+@dataclass(**_SLOTS)
 class QueuedPrompt:
     """Represents a prompt in the queue."""
 
-    id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
+    id: str = field(default_factory=lambda: os.urandom(4).hex())  # 8 hex digits
     content: str = ""
     working_directory: str = "."
     created_at: datetime = field(default_factory=datetime.now)
@@ -40,31 +78,66 @@ class QueuedPrompt:
     reset_time: Optional[datetime] = None
     session_id: Optional[str] = None  # Claude Code session ID for --resume
     is_session_start: bool = False  # True if this prompt starts a new chat session
+    chat_name: Optional[str] = None  # Chat this prompt belongs to, if any
+    output_path: Optional[str] = None  # File with the full output of the last run
+    # add_log() entries not yet rendered into execution_log: (time.time(), message, args)
+    _pending_log: List[Tuple[float, str, tuple]] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+    # Reads execution_log on first use; set for prompts rebuilt from the parse cache
+    _log_loader: Optional[Callable[[], str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # File name derived from id and content, cached by MarkdownPromptParser
+    _base_filename: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
-    def add_log(self, message: str) -> None:
-        """Add a log entry with timestamp."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.execution_log += f"[{timestamp}] {message}\n"
+    def add_log(self, message: str, *args: Any) -> None:
+        """Add a log entry with timestamp.
+
+        `message % args` is only formatted when the log is rendered.
+        """
+        self._pending_log.append((time.time(), message, args))
+
+    def render_log(self) -> str:
+        """Return the execution log, rendering entries added since the last call."""
+        if self._log_loader is not None:
+            self.execution_log = self._log_loader()
+            self._log_loader = None
+        if self._pending_log:
+            lines = [self.execution_log]
+            for logged_at, message, args in self._pending_log:
+                if args:
+                    message = message % args
+                lines.append(f"[{_log_timestamp(int(logged_at))}] {message}\n")
+            log = "".join(lines)
+            if len(log) > MAX_EXECUTION_LOG_CHARS:
+                # Cut at a line boundary, or mid-line if the kept tail is a
+                # single line (the log's final newline does not count)
+                start = len(log) - MAX_EXECUTION_LOG_CHARS
+                cut = log.find("\n", start, len(log) - 1)
+                log = log[cut + 1:] if cut != -1 else log[start:]
+            self.execution_log = log
+            self._pending_log.clear()
+        return self.execution_log
 
     def can_retry(self) -> bool:
         """Check if this prompt can be retried."""
-        return self.retry_count < self.max_retries and self.status in [
-            PromptStatus.FAILED,
-            PromptStatus.RATE_LIMITED,
-        ]
+        return self.retry_count < self.max_retries and self.status in _RETRYABLE_STATUSES
 
-    def should_execute_now(self) -> bool:
+    def should_execute_now(self, now: Optional[datetime] = None) -> bool:
         """Check if this prompt should be executed now (not rate limited)."""
         if self.status != PromptStatus.RATE_LIMITED:
             return True
 
-        if self.reset_time and datetime.now() >= self.reset_time:
+        if self.reset_time and (now or datetime.now()) >= self.reset_time:
             return True
 
         return False
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RateLimitInfo:
     """Information about rate limiting from Claude Code response."""
 
@@ -74,64 +147,163 @@ class RateLimitInfo:
     timestamp: Optional[datetime] = None
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class QueueState:
     """Overall state of the queue system."""
 
+    # Kept ordered by priority (stable for equal priorities)
     prompts: List[QueuedPrompt] = field(default_factory=list)
     last_processed: Optional[datetime] = None
     total_processed: int = 0
     failed_count: int = 0
     rate_limited_count: int = 0
     current_rate_limit: Optional[RateLimitInfo] = None
+    # Lookup indexes over `prompts`, maintained by add_prompt/remove_prompt
+    _by_id: Dict[str, QueuedPrompt] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _by_session: Dict[str, List[QueuedPrompt]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    # chat name -> prompt that starts that chat's session
+    _session_starts: Dict[str, QueuedPrompt] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        self.prompts.sort(key=_BY_PRIORITY)
+        for prompt in self.prompts:
+            self._index(prompt)
+
+    def _index(self, prompt: QueuedPrompt) -> None:
+        self._by_id[prompt.id] = prompt
+        if prompt.session_id:
+            self._by_session.setdefault(prompt.session_id, []).append(prompt)
+        if prompt.is_session_start:
+            chat_name = prompt.chat_name or chat_name_from_temp_session(prompt.session_id)
+            if chat_name:
+                self._session_starts[chat_name] = prompt
+
+    def _unindex(self, prompt: QueuedPrompt) -> None:
+        self._by_id.pop(prompt.id, None)
+        chat_name = prompt.chat_name or chat_name_from_temp_session(prompt.session_id)
+        if self._session_starts.get(chat_name) is prompt:
+            del self._session_starts[chat_name]
+        session_prompts = self._by_session.get(prompt.session_id)
+        if session_prompts:
+            session_prompts[:] = [p for p in session_prompts if p is not prompt]
+            if not session_prompts:
+                del self._by_session[prompt.session_id]
+
+    def get_next_prompt(
+        self, busy_sessions: Container[str] = (), now: Optional[datetime] = None
+    ) -> Optional[QueuedPrompt]:
+        """Get the next prompt to execute (highest priority, can execute now).
 
-    def get_next_prompt(self) -> Optional[QueuedPrompt]:
-        """Get the next prompt to execute (highest priority, can execute now)."""
-        executable_prompts = [
-            p
-            for p in self.prompts
-            if p.status == PromptStatus.QUEUED and p.should_execute_now()
-        ]
-
-        if not executable_prompts:
-            # Check for rate-limited prompts that can now be retried
-            retry_prompts = [
-                p
-                for p in self.prompts
-                if p.status == PromptStatus.RATE_LIMITED
-                and p.should_execute_now()
-                and p.can_retry()
-            ]
-            if retry_prompts:
-                # Reset status for retry
-                prompt = min(retry_prompts, key=lambda p: p.priority)
-                prompt.status = PromptStatus.QUEUED
+        Prompts of sessions in busy_sessions are skipped, so a session never
+        runs two prompts at once. Reset times are compared against now
+        (default: the current time).
+        """
+        # self.prompts is ordered by priority, so the first match is the one
+        # to run; a QUEUED prompt can always execute now. The first
+        # rate-limited prompt that may be retried is kept as a fallback
+        # during the same pass.
+        if now is None:
+            now = datetime.now()
+        retry = None
+        for prompt in self.prompts:
+            if prompt.session_id in busy_sessions:
+                continue
+            if prompt.status == PromptStatus.QUEUED:
                 return prompt
+            if (
+                retry is None
+                and prompt.status == PromptStatus.RATE_LIMITED
+                and prompt.should_execute_now(now)
+                and prompt.can_retry()
+            ):
+                retry = prompt
 
-            return None
+        if retry is not None:
+            # Reset status for retry
+            retry.status = PromptStatus.QUEUED
+        return retry
 
-        # Return highest priority prompt (lowest number)
-        return min(executable_prompts, key=lambda p: p.priority)
+    def _bisect(self, priority: int, after: bool) -> int:
+        """Position for a prompt of this priority in the ordered list: after
+        (after=True) or before (after=False) prompts of equal priority."""
+        lo, hi = 0, len(self.prompts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_priority = self.prompts[mid].priority
+            if mid_priority < priority or (after and mid_priority == priority):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
 
     def add_prompt(self, prompt: QueuedPrompt) -> None:
-        """Add a prompt to the queue."""
-        self.prompts.append(prompt)
+        """Add a prompt to the queue, keeping prompts ordered by priority."""
+        self.prompts.insert(self._bisect(prompt.priority, after=True), prompt)
+        self._index(prompt)
 
     def remove_prompt(self, prompt_id: str) -> bool:
         """Remove a prompt from the queue."""
-        original_count = len(self.prompts)
-        self.prompts = [p for p in self.prompts if p.id != prompt_id]
-        return len(self.prompts) < original_count
+        prompt = self._by_id.get(prompt_id)
+        if prompt is None:
+            return False
+
+        self._unindex(prompt)
+        # Only prompts of the same priority need checking, unless the
+        # priority was changed in place after the prompt was added
+        start = self._bisect(prompt.priority, after=False)
+        for i in range(start, len(self.prompts)):
+            if self.prompts[i] is prompt:
+                del self.prompts[i]
+                return True
+            if self.prompts[i].priority != prompt.priority:
+                break
+        self.prompts[:] = [p for p in self.prompts if p is not prompt]
+        return True
+
+    def remove_prompts(self, prompt_ids: Container[str]) -> None:
+        """Remove several prompts in a single pass over the queue."""
+        kept = []
+        for prompt in self.prompts:
+            if prompt.id in prompt_ids:
+                self._unindex(prompt)
+            else:
+                kept.append(prompt)
+        self.prompts[:] = kept
 
     def get_prompt(self, prompt_id: str) -> Optional[QueuedPrompt]:
         """Get a prompt by ID."""
-        for prompt in self.prompts:
-            if prompt.id == prompt_id:
-                return prompt
+        return self._by_id.get(prompt_id)
+
+    def get_session_prompts(self, session_id: str) -> List[QueuedPrompt]:
+        """Get the prompts that belong to a session."""
+        return list(self._by_session.get(session_id, ()))
+
+    def get_session_start(self, chat_name: str) -> Optional[QueuedPrompt]:
+        """Get the queued prompt that starts a chat's session, if any."""
+        prompt = self._session_starts.get(chat_name)
+        if prompt is not None and prompt.is_session_start:
+            return prompt
         return None
 
+    def rename_session(self, old_session_id: str, new_session_id: str) -> List[QueuedPrompt]:
+        """Move every prompt of a session to a new session ID and return them."""
+        moved = self._by_session.pop(old_session_id, [])
+        for prompt in moved:
+            prompt.session_id = new_session_id
+        if moved:
+            self._by_session.setdefault(new_session_id, []).extend(moved)
+        return moved
+
     def get_stats(self) -> Dict[str, Any]:
         """Get queue statistics."""
+        # Count active prompts for other statuses in one pass
+        counts = Counter(p.status for p in self.prompts)
         status_counts = {}
         for status in PromptStatus:
             if status == PromptStatus.COMPLETED:
@@ -141,10 +313,7 @@ class QueueState:
                 # Use persistent counter for failed prompts
                 status_counts[status.value] = self.failed_count
             else:
-                # Count active prompts for other statuses
-                status_counts[status.value] = len(
-                    [p for p in self.prompts if p.status == status]
-                )
+                status_counts[status.value] = counts[status]
 
         return {
             "total_prompts": len(self.prompts),
@@ -170,7 +339,7 @@ class QueueState:
         }
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ExecutionResult:
     """Result of executing a prompt."""
 
@@ -179,6 +348,10 @@ class ExecutionResult:
     error: str = ""
     rate_limit_info: Optional[RateLimitInfo] = None
     execution_time: float = 0.0
+    # Real Claude session ID created by a session-start prompt
+    session_id: Optional[str] = None
+    # File with the full output; `output` then only holds its tail
+    output_path: Optional[str] = None
 
     @property
     def is_rate_limited(self) -> bool:
@@ -2,22 +2,38 @@
 Queue manager with execution loop.
 """
 
+import heapq
 import os
+import shutil
 import time
 import signal
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Callable, Dict, Any, Tuple
-
-from .models import QueuedPrompt, QueueState, PromptStatus, ExecutionResult
-from .storage import QueueStorage
+from typing import Optional, Callable, Dict, Any, List, Tuple
+
+from .models import (
+    QueuedPrompt,
+    QueueState,
+    PromptStatus,
+    ExecutionResult,
+    chat_name_from_temp_session,
+)
+from .storage import FileSignature, QueueStorage
 from .claude_interface import ClaudeCodeInterface
-from .chat_sessions import ChatSessionManager
+from .watcher import QueueWatcher
 
 
 class QueueManager:
     """Manages the queue execution lifecycle."""
 
+    # Longest idle wait between queue checks, in seconds
+    MAX_IDLE_INTERVAL = 600
+    # How long a rate-limited prompt waits before it is retried
+    RATE_LIMIT_COOLDOWN = timedelta(minutes=5)
+    # How long a successful connection test is trusted across restarts, in seconds
+    CONNECTION_CHECK_TTL = 300
+
     def __init__(
         self,
         storage_dir: str = "~/.claude-queue",
@@ -26,42 +42,93 @@ class QueueManager:
         timeout: int = 3600,
     ):
         self.storage = QueueStorage(storage_dir)
-        self.claude_interface = ClaudeCodeInterface(claude_command, timeout)
-        self.chat_sessions = ChatSessionManager(storage_dir)
+        # A recent successful test of the same binary makes the CLI's
+        # `--version` probe redundant
+        self.claude_interface = ClaudeCodeInterface(
+            claude_command,
+            timeout,
+            output_dir=self.storage.output_dir,
+            verify=not self._connection_check_is_fresh(
+                self._claude_command_fingerprint(claude_command)
+            ),
+        )
+        # Share the storage's session manager so the process holds one connection
+        self.chat_sessions = self.storage.chat_sessions
         self.check_interval = check_interval
         self.running = False
         self.state: Optional[QueueState] = None
+        # Set whenever self.state changes; cleared by a successful save
+        self._state_dirty = False
+        # Prompts whose files must be rewritten by the next save
+        self._dirty_prompts: Dict[str, QueuedPrompt] = {}
+        # path -> signature of queue files already reflected in self.state;
+        # only tracked by a running processor
+        self._known_files: Optional[Dict[str, FileSignature]] = None
+        # Consecutive iterations that found nothing to run
+        self._idle_streak = 0
+        self._watcher: Optional[QueueWatcher] = None
+        # (retry deadline on the time.monotonic() clock, prompt id, rate_limited_at)
+        # for rate-limited prompts; entries for prompts that have since moved on
+        # are skipped when popped
+        self._rate_limit_heap: List[Tuple[float, str, datetime]] = []
+        # Prompts run on a worker pool; all state changes stay on the main thread
+        self.max_workers = 1
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight: Dict[str, Tuple[QueuedPrompt, Future]] = {}
+        # Set by a second signal: running prompts are killed and requeued
+        self._abandon_in_flight = False
 
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
 
     def _signal_handler(self, signum, frame):
-        """Handle shutdown signals."""
+        """Handle shutdown signals.
+
+        The first signal lets running prompts finish; a second one stops them.
+        """
+        if not self.running and self._in_flight:
+            print(f"\nReceived signal {signum} again, stopping running prompts...")
+            self._abandon_in_flight = True
+            self.claude_interface.terminate_running()
+            return
+
         print(f"\nReceived signal {signum}, shutting down gracefully...")
         self.stop()
 
-    def start(self, callback: Optional[Callable[[QueueState], None]] = None) -> None:
-        """Start the queue processing loop."""
+    def start(
+        self,
+        callback: Optional[Callable[[QueueState], None]] = None,
+        max_workers: int = 1,
+    ) -> None:
+        """Start the queue processing loop, running up to max_workers prompts at once."""
         print("Starting Claude Code Queue Manager...")
 
-        is_working, message = self.claude_interface.test_connection()
+        is_working, message = self._test_connection()
         if not is_working:
             print(f"Error: {message}")
             return
 
         print(f"✓ {message}")
 
-        self.state = self.storage.load_queue_state()
+        self._load_state()
         print(f"✓ Loaded queue with {len(self.state.prompts)} prompts")
 
+        self._watcher = QueueWatcher(self.storage.queue_dir, self.check_interval)
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="claude-queue"
+        )
+
         self.running = True
 
         try:
             while self.running:
-                self._process_queue_iteration(callback)
+                made_progress = self._process_queue_iteration(callback)
 
-                if self.running:
-                    time.sleep(self.check_interval)
+                # Move straight on to the next prompt while work is getting
+                # done; only wait when idle, retrying or rate limited
+                if self.running and not made_progress:
+                    self._wait_for_work()
 
         except KeyboardInterrupt:
             print("\nShutdown requested by user")
@@ -70,47 +137,236 @@ class QueueManager:
         finally:
             self._shutdown()
 
+    @staticmethod
+    def _claude_command_fingerprint(claude_command: str) -> Optional[str]:
+        """Identify the installed Claude CLI binary by path and mtime."""
+        command_path = shutil.which(claude_command)
+        if not command_path:
+            return None
+        try:
+            return f"{command_path}:{os.stat(command_path).st_mtime_ns}"
+        except OSError:
+            return None
+
+    def _connection_check_is_fresh(self, fingerprint: Optional[str]) -> bool:
+        """Whether the binary with this fingerprint passed a test within the TTL."""
+        if not fingerprint:
+            return False
+        record = self.storage.load_connection_check()
+        return bool(
+            record
+            and record.get("command") == fingerprint
+            and time.time() - record.get("ts", 0) < self.CONNECTION_CHECK_TTL
+        )
+
+    def _test_connection(self) -> Tuple[bool, str]:
+        """Test the Claude CLI, reusing a recent successful test of the same binary."""
+        fingerprint = self._claude_command_fingerprint(self.claude_interface.claude_command)
+        if self._connection_check_is_fresh(fingerprint):
+            return True, "Claude Code CLI is working (cached)"
+
+        is_working, message = self.claude_interface.test_connection()
+        if is_working and fingerprint:
+            self.storage.save_connection_check({"ts": time.time(), "command": fingerprint})
+        return is_working, message
+
     def stop(self) -> None:
-        """Stop the queue processing loop."""
+        """Stop the queue processing loop, interrupting an idle wait."""
         self.running = False
+        if self._watcher is not None:
+            self._watcher.wake()
+
+    def _wait_for_work(self) -> None:
+        """Sleep before the next iteration, backing off while the queue stays idle.
+
+        The wait doubles with each idle iteration up to MAX_IDLE_INTERVAL, but
+        never runs past the next rate-limit cooldown. It ends early as soon as
+        the queue directory changes (e.g. a prompt is added) or on shutdown.
+        """
+        backoff = 2 ** min(max(self._idle_streak - 1, 0), 10)
+        delay = max(
+            self.check_interval,
+            min(self.check_interval * backoff, self.MAX_IDLE_INTERVAL),
+        )
+
+        if self._rate_limit_heap:
+            retry_in = self._rate_limit_heap[0][0] - time.monotonic()
+            delay = min(delay, max(retry_in, 0))
+
+        deadline = time.monotonic() + delay
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Our own saves also trigger the watcher; only wake up for files
+            # that are not already reflected in self.state
+            if (
+                self._watcher.wait(remaining)
+                and self.storage.scan_queue_files() != self._known_files
+            ):
+                self._idle_streak = 0
+                return
+            if any(future.done() for _, future in self._in_flight.values()):
+                return
+
+    def _mark_dirty(self, *prompts: QueuedPrompt) -> None:
+        """Record that the state changed, including the given prompts."""
+        self._state_dirty = True
+        for prompt in prompts:
+            self._dirty_prompts[prompt.id] = prompt
+
+    def _maybe_save(self) -> bool:
+        """Save the queue state if it changed since the last save.
+
+        Only the files of prompts marked dirty are rewritten; if just the
+        counters changed, only queue-state.json is.
+        """
+        if not self._state_dirty:
+            return True
+
+        if not self.storage.save_queue_state(self.state, self._dirty_prompts.values()):
+            return False
+        self._state_dirty = False
+        self._dirty_prompts.clear()
+        if self._known_files is not None:
+            self._remember_own_files()
+        return True
+
+    def _remember_own_files(self) -> None:
+        """Record the files just written so they are not re-read as external changes.
+
+        Files for prompts not in memory (added by another process meanwhile) are
+        left out, so they are picked up by the next _apply_queue_changes().
+        """
+        prompt_ids = {prompt.id for prompt in self.state.prompts}
+        self._known_files = {
+            path: signature
+            for path, signature in self.storage.scan_queue_files().items()
+            if self.storage.prompt_id_from_filename(os.path.basename(path)) in prompt_ids
+        }
+
+    def _load_state(self) -> None:
+        """Load the whole queue from disk."""
+        # Scan before loading so a file written in between is seen as new later
+        self._known_files = self.storage.scan_queue_files()
+        self.state = self.storage.load_queue_state()
+
+        now = datetime.now()
+        self._rate_limit_heap = []
+        for prompt in self.state.prompts:
+            self._requeue_interrupted(prompt, "Execution interrupted by a previous run")
+            self._track_rate_limit(prompt, now)
+
+    def _requeue_interrupted(self, prompt: QueuedPrompt, reason: str) -> None:
+        """Put a prompt left EXECUTING without a running worker back in the queue."""
+        if prompt.status == PromptStatus.EXECUTING and prompt.id not in self._in_flight:
+            prompt.status = PromptStatus.QUEUED
+            prompt.add_log(reason)
+            self._mark_dirty(prompt)
+
+    def _track_rate_limit(self, prompt: QueuedPrompt, now: datetime) -> None:
+        """Schedule a rate-limited prompt for its retry check.
+
+        The check runs after RATE_LIMIT_COOLDOWN, or at the reported reset
+        time if that comes sooner.
+        """
+        if prompt.status == PromptStatus.RATE_LIMITED and prompt.rate_limited_at:
+            retry_at = prompt.rate_limited_at + self.RATE_LIMIT_COOLDOWN
+            if prompt.reset_time and prompt.reset_time < retry_at:
+                retry_at = prompt.reset_time
+            retry_in = retry_at - now
+            heapq.heappush(
+                self._rate_limit_heap,
+                (
+                    time.monotonic() + retry_in.total_seconds(),
+                    prompt.id,
+                    prompt.rate_limited_at,
+                ),
+            )
+
+    def _apply_queue_changes(self, now: datetime) -> None:
+        """Bring self.state up to date with queue files changed by other processes."""
+        changed, present_ids, self._known_files = self.storage.load_changes_since(
+            self._known_files
+        )
+
+        for prompt in changed:
+            # A running prompt keeps its in-memory copy until its result is in
+            if prompt.id in self._in_flight:
+                continue
+            self.state.remove_prompt(prompt.id)
+            self.state.add_prompt(prompt)
+            self._requeue_interrupted(prompt, "Execution interrupted by a previous run")
+            self._track_rate_limit(prompt, now)
+
+        # Prompts whose files left the queue directory were finished, cancelled
+        # or deleted
+        gone = {
+            prompt.id
+            for prompt in self.state.prompts
+            if prompt.id not in present_ids and prompt.id not in self._in_flight
+        }
+        if gone:
+            self.state.remove_prompts(gone)
 
     def _shutdown(self) -> None:
         """Clean shutdown procedure."""
         print("Shutting down...")
 
-        if self.state:
-            for prompt in self.state.prompts:
-                if prompt.status == PromptStatus.EXECUTING:
-                    prompt.status = PromptStatus.QUEUED
-                    prompt.add_log("Execution interrupted during shutdown")
+        if self._executor is not None:
+            if self._in_flight:
+                print(
+                    f"Waiting for {len(self._in_flight)} running prompt(s) to finish "
+                    "(press Ctrl+C again to stop them)..."
+                )
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            if self._abandon_in_flight:
+                # Killed mid-run: requeue them instead of recording a result
+                interrupted = [prompt for prompt, _ in self._in_flight.values()]
+                self._in_flight.clear()
+                for prompt in interrupted:
+                    self._requeue_interrupted(prompt, "Execution interrupted during shutdown")
+            else:
+                self._collect_finished_prompts(datetime.now())
 
-            self.storage.save_queue_state(self.state)
+        if self.state:
+            self._maybe_save()
             print("✓ Queue state saved")
 
+        self.chat_sessions.flush_bumps()
+
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
         print("Queue manager stopped")
 
     def _process_queue_iteration(
         self, callback: Optional[Callable[[QueueState], None]] = None
-    ) -> None:
-        """Process one iteration of the queue."""
-        previous_total_processed = self.state.total_processed if self.state else 0
-        previous_failed_count = self.state.failed_count if self.state else 0
-        previous_rate_limited_count = self.state.rate_limited_count if self.state else 0
-        previous_last_processed = self.state.last_processed if self.state else None
-        
-        self.state = self.storage.load_queue_state()
-        
-        self.state.total_processed = max(self.state.total_processed, previous_total_processed)
-        self.state.failed_count = max(self.state.failed_count, previous_failed_count)
-        self.state.rate_limited_count = max(self.state.rate_limited_count, previous_rate_limited_count)
-        if previous_last_processed and (not self.state.last_processed or self.state.last_processed < previous_last_processed):
-            self.state.last_processed = previous_last_processed
+    ) -> bool:
+        """Process one iteration of the queue.
+
+        Returns True if a prompt finished (completed or failed for good), meaning
+        the next iteration can run immediately.
+        """
+        # One timestamp for everything this iteration records
+        now = datetime.now()
+
+        # In-memory state is authoritative; only pick up files other processes
+        # (e.g. `claude-queue add`) changed since the last iteration
+        if self.state is None or self._known_files is None:
+            self._load_state()
+        else:
+            self._apply_queue_changes(now)
 
         self._check_rate_limited_prompts()
+        self.chat_sessions.flush_bumps()
 
-        next_prompt = self.state.get_next_prompt()
+        made_progress = self._collect_finished_prompts(now)
+        started = self._dispatch_ready_prompts(now)
 
-        if next_prompt is None:
+        if not started and not self._in_flight and not made_progress:
             rate_limited_prompts = [
                 p for p in self.state.prompts if p.status == PromptStatus.RATE_LIMITED
             ]
@@ -121,79 +377,137 @@ class QueueManager:
             else:
                 print("No prompts in queue")
 
+            # Persist any rate-limit transitions
+            self._maybe_save()
+            self._idle_streak += 1
+
             if callback:
                 callback(self.state)
-            return
+            return False
 
-        print(f"Executing prompt {next_prompt.id}: {next_prompt.content[:50]}...")
-        self._execute_prompt(next_prompt)
+        self._idle_streak = 0
 
-        self.storage.save_queue_state(self.state)
+        self._maybe_save()
 
         if callback:
             callback(self.state)
 
+        return made_progress
+
+    def _dispatch_ready_prompts(self, now: datetime) -> int:
+        """Start ready prompts while worker slots are free. Returns how many started."""
+        started = 0
+        while len(self._in_flight) < self.max_workers:
+            busy_sessions = {
+                prompt.session_id
+                for prompt, _ in self._in_flight.values()
+                if prompt.session_id
+            }
+            next_prompt = self.state.get_next_prompt(busy_sessions, now)
+            if next_prompt is None:
+                break
+
+            print(f"Executing prompt {next_prompt.id}: {next_prompt.content[:50]}...")
+            self._execute_prompt(next_prompt, now)
+            started += 1
+        return started
+
+    def _collect_finished_prompts(self, now: datetime) -> bool:
+        """Apply the results of prompts whose execution has finished.
+
+        Returns True if any of them completed or failed for good.
+        """
+        made_progress = False
+        for prompt_id, (prompt, future) in list(self._in_flight.items()):
+            if not future.done():
+                continue
+            del self._in_flight[prompt_id]
+
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ExecutionResult(
+                    success=False, output="", error=f"Error executing prompt: {e}"
+                )
+            self._process_execution_result(prompt, result, now)
+
+            if prompt.status in (PromptStatus.COMPLETED, PromptStatus.FAILED):
+                made_progress = True
+        return made_progress
+
+    def _on_prompt_done(self, future: Future) -> None:
+        """Wake the main loop when a worker finishes (runs on the worker thread)."""
+        if self._watcher is not None:
+            self._watcher.wake()
+
     def _check_rate_limited_prompts(self) -> None:
         """Check if any rate-limited prompts should be retried (simple periodic retry)."""
-        current_time = datetime.now()
+        current_time = time.monotonic()
+        heap = self._rate_limit_heap
 
-        for prompt in self.state.prompts:
-            if prompt.status == PromptStatus.RATE_LIMITED:
-                # Check if enough time has passed since last rate limit (5+ minutes)
-                if (
-                    prompt.rate_limited_at
-                    and current_time >= prompt.rate_limited_at + timedelta(minutes=5)
-                ):
-
-                    if prompt.can_retry():
-                        prompt.status = PromptStatus.QUEUED
-                        prompt.add_log(f"Retrying after rate limit cooldown")
-                        print(f"✓ Prompt {prompt.id} ready for retry after cooldown")
-                    else:
-                        prompt.status = PromptStatus.FAILED
-                        prompt.add_log(f"Max retries ({prompt.max_retries}) exceeded")
-                        print(f"✗ Prompt {prompt.id} failed - max retries exceeded")
-
-    def _execute_prompt(self, prompt: QueuedPrompt) -> None:
-        """Execute a single prompt."""
+        # Only prompts whose cooldown has passed are looked at
+        while heap and heap[0][0] <= current_time:
+            _, prompt_id, rate_limited_at = heapq.heappop(heap)
+            prompt = self.state.get_prompt(prompt_id)
+            if (
+                prompt is None
+                or prompt.status != PromptStatus.RATE_LIMITED
+                or prompt.rate_limited_at != rate_limited_at
+            ):
+                continue
+
+            self._mark_dirty(prompt)
+            if prompt.can_retry():
+                prompt.status = PromptStatus.QUEUED
+                prompt.add_log("Retrying after rate limit cooldown")
+                print(f"✓ Prompt {prompt.id} ready for retry after cooldown")
+            else:
+                prompt.status = PromptStatus.FAILED
+                prompt.add_log("Max retries (%d) exceeded", prompt.max_retries)
+                print(f"✗ Prompt {prompt.id} failed - max retries exceeded")
+
+    def _execute_prompt(self, prompt: QueuedPrompt, now: datetime) -> None:
+        """Mark a prompt as executing and hand it to the worker pool."""
         prompt.status = PromptStatus.EXECUTING
-        prompt.last_executed = datetime.now()
+        prompt.last_executed = now
         prompt.add_log(
-            f"Started execution (attempt {prompt.retry_count + 1}/{prompt.max_retries})"
+            "Started execution (attempt %d/%d)", prompt.retry_count + 1, prompt.max_retries
         )
+        # Saved with the rest of the iteration's changes once dispatching is done
+        self._mark_dirty(prompt)
 
-        self.storage.save_queue_state(self.state)
+        future = self._executor.submit(self._run_prompt, prompt)
+        self._in_flight[prompt.id] = (prompt, future)
+        future.add_done_callback(self._on_prompt_done)
 
+    def _run_prompt(self, prompt: QueuedPrompt) -> ExecutionResult:
+        """Run a prompt through the Claude CLI. Runs on a worker thread."""
         # Handle session start prompts
         if prompt.is_session_start:
-            result = self._execute_session_start(prompt)
-        else:
-            result = self.claude_interface.execute_prompt(prompt)
-
-        self._process_execution_result(prompt, result)
+            return self._execute_session_start(prompt)
+        return self.claude_interface.execute_prompt(prompt)
 
     def _execute_session_start(self, prompt: QueuedPrompt) -> ExecutionResult:
-        """Execute a session start prompt and create real Claude session using CLI."""
-        import subprocess
-        from pathlib import Path
+        """Execute a session start prompt and create real Claude session using CLI.
 
+        Runs on a worker thread, so queued prompts are switched over to the new
+        session later, by _process_execution_result.
+        """
         start_time = time.time()
 
         try:
-            # Extract chat name from temp session ID
-            temp_session_parts = prompt.session_id.split('-')
-            chat_name = temp_session_parts[1] if len(temp_session_parts) > 1 else "unnamed"
+            # Prompts queued before chat_name was stored only have it in the temp session ID
+            chat_name = (
+                prompt.chat_name
+                or chat_name_from_temp_session(prompt.session_id)
+                or "unnamed"
+            )
 
             # Generate a real UUID for this session
             real_session_id = str(uuid.uuid4())
 
             # Execute via CLI to create new session with specific session ID
-            original_cwd = os.getcwd()
-            working_dir = Path(prompt.working_directory).resolve()
-            if not working_dir.exists():
-                working_dir.mkdir(parents=True, exist_ok=True)
-
-            os.chdir(working_dir)
+            working_dir = self.claude_interface.working_dir_for(prompt)
 
             cmd = [
                 self.claude_interface.claude_command,
@@ -203,33 +517,22 @@ class QueueManager:
                 prompt.content
             ]
 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=self.claude_interface.timeout
-            )
-
-            os.chdir(original_cwd)
+            # stdout goes to the prompt's output file
+            output_path = self.claude_interface.output_path_for(prompt)
+            result = self.claude_interface.run_cli(cmd, working_dir, output_path)
 
             # Check if execution was successful
             if result.returncode == 0:
 
                 # Save real session to database
                 if self.chat_sessions.save_chat_session(chat_name, real_session_id, prompt.working_directory):
-                    # Update prompt with real session ID
-                    old_temp_session_id = prompt.session_id
-                    prompt.session_id = real_session_id
-                    prompt.is_session_start = False  # Mark as no longer session start
-
-                    # Update all other prompts in queue that have the same temp session ID
-                    self._update_temp_session_ids(old_temp_session_id, real_session_id)
-
                     execution_time = time.time() - start_time
                     return ExecutionResult(
                         success=True,
                         output=result.stdout,
-                        execution_time=execution_time
+                        execution_time=execution_time,
+                        session_id=real_session_id,
+                        output_path=str(output_path) if output_path else None,
                     )
                 else:
                     execution_time = time.time() - start_time
@@ -249,10 +552,6 @@ class QueueManager:
                 )
 
         except Exception as e:
-            try:
-                os.chdir(original_cwd)
-            except:
-                pass
             execution_time = time.time() - start_time
             return ExecutionResult(
                 success=False,
@@ -262,24 +561,35 @@ class QueueManager:
             )
 
     def _update_temp_session_ids(self, old_temp_session_id: str, real_session_id: str) -> None:
-        """Update all prompts in queue that have the same temp session ID."""
-        for queue_prompt in self.state.prompts:
-            if queue_prompt.session_id == old_temp_session_id:
-                queue_prompt.session_id = real_session_id
-                # Re-save the prompt file with updated session ID
-                self.storage.save_prompt(queue_prompt)
+        """Update all prompts in queue that have the same temp session ID.
+
+        The prompt files are rewritten together with the rest of the state by
+        the save that follows every execution, rather than one by one here.
+        """
+        self._mark_dirty(*self.state.rename_session(old_temp_session_id, real_session_id))
 
     def _process_execution_result(
-        self, prompt: QueuedPrompt, result: ExecutionResult
+        self, prompt: QueuedPrompt, result: ExecutionResult, now: datetime
     ) -> None:
         """Process the result of prompt execution."""
-        execution_summary = f"Execution completed in {result.execution_time:.1f}s"
+        self._mark_dirty(prompt)
+        if result.output_path:
+            prompt.output_path = result.output_path
 
         if result.success:
+            if prompt.is_session_start and result.session_id:
+                # Update prompt with real session ID
+                old_temp_session_id = prompt.session_id
+                prompt.session_id = real_session_id = result.session_id
+                prompt.is_session_start = False  # Mark as no longer session start
+
+                # Update all other prompts in queue that have the same temp session ID
+                self._update_temp_session_ids(old_temp_session_id, real_session_id)
+
             prompt.status = PromptStatus.COMPLETED
-            prompt.add_log(f"{execution_summary} - SUCCESS")
+            prompt.add_log("Execution completed in %.1fs - SUCCESS", result.execution_time)
             if result.output:
-                prompt.add_log(f"Output:\n{result.output}")
+                prompt.add_log("Output:\n%s", result.output)
 
             self.state.total_processed += 1
             print(f"✓ Prompt {prompt.id} completed successfully")
@@ -287,40 +597,44 @@ class QueueManager:
         elif result.is_rate_limited:
             was_already_rate_limited = prompt.status == PromptStatus.RATE_LIMITED
             prompt.status = PromptStatus.RATE_LIMITED
-            prompt.rate_limited_at = datetime.now()
+            prompt.rate_limited_at = now
+            prompt.reset_time = result.rate_limit_info.reset_time
             prompt.retry_count += 1
 
-            prompt.add_log(f"{execution_summary} - RATE LIMITED")
+            prompt.add_log("Execution completed in %.1fs - RATE LIMITED", result.execution_time)
             if result.rate_limit_info and result.rate_limit_info.limit_message:
-                prompt.add_log(f"Message: {result.rate_limit_info.limit_message}")
+                prompt.add_log("Message: %s", result.rate_limit_info.limit_message)
 
             if not was_already_rate_limited and self.state is not None:
                 self.state.rate_limited_count += 1
+            self._track_rate_limit(prompt, now)
             print(f"⚠ Prompt {prompt.id} rate limited, will retry later")
 
         else:
             prompt.retry_count += 1
+            # The CLI may be broken; probe it again on the next start
+            self.storage.clear_connection_check()
 
             if prompt.can_retry():
                 prompt.status = PromptStatus.QUEUED
-                prompt.add_log(f"{execution_summary} - FAILED (will retry)")
+                prompt.add_log("Execution completed in %.1fs - FAILED (will retry)", result.execution_time)
                 if result.error:
-                    prompt.add_log(f"Error: {result.error}")
+                    prompt.add_log("Error: %s", result.error)
                 print(
                     f"✗ Prompt {prompt.id} failed, will retry ({prompt.retry_count}/{prompt.max_retries})"
                 )
             else:
                 prompt.status = PromptStatus.FAILED
-                prompt.add_log(f"{execution_summary} - FAILED (max retries exceeded)")
+                prompt.add_log("Execution completed in %.1fs - FAILED (max retries exceeded)", result.execution_time)
                 if result.error:
-                    prompt.add_log(f"Error: {result.error}")
+                    prompt.add_log("Error: %s", result.error)
 
                 self.state.failed_count += 1
                 print(
                     f"✗ Prompt {prompt.id} failed permanently after {prompt.max_retries} attempts"
                 )
 
-        self.state.last_processed = datetime.now()
+        self.state.last_processed = now
 
     def add_prompt(self, prompt: QueuedPrompt) -> bool:
         """Add a prompt to the queue."""
@@ -329,8 +643,9 @@ class QueueManager:
                 self.state = self.storage.load_queue_state()
 
             self.state.add_prompt(prompt)
+            self._mark_dirty(prompt)
 
-            success = self.storage.save_queue_state(self.state)
+            success = self._maybe_save()
             if success:
                 print(f"✓ Added prompt {prompt.id} to queue")
             else:
@@ -356,8 +671,9 @@ class QueueManager:
 
                 prompt.status = PromptStatus.CANCELLED
                 prompt.add_log("Cancelled by user")
+                self._mark_dirty(prompt)
 
-                success = self.storage.save_queue_state(self.state)
+                success = self._maybe_save()
                 if success:
                     print(f"✓ Cancelled prompt {prompt_id}")
                 else:
@@ -395,11 +711,8 @@ class QueueManager:
         if not self.state:
             self.state = self.storage.load_queue_state()
 
-        for prompt in self.state.prompts:
-            if prompt.is_session_start and prompt.session_id and f"temp-{chat_name}-" in prompt.session_id:
-                return prompt.session_id
-
-        return None
+        prompt = self.state.get_session_start(chat_name)
+        return prompt.session_id if prompt else None
 
     def create_chat_session(self, chat_name: str, initial_prompt: str, working_directory: str = ".") -> Tuple[bool, str, Optional[str]]:
         """Create a new chat session by adding initial prompt to queue."""
@@ -417,6 +730,7 @@ class QueueManager:
                 working_directory=working_directory,
                 session_id=temp_session_id,
                 is_session_start=True,
+                chat_name=chat_name,
                 priority=-1  # Higher priority to execute first
             )
 
@@ -2,16 +2,193 @@
 Queue storage system with markdown support.
 """
 
+import functools
 import json
+import os
 import re
 import shutil
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 import yaml  # type: ignore
 
+try:
+    from yaml import CSafeDumper as _YamlDumper, CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper as _YamlDumper, SafeLoader as _YamlLoader  # type: ignore
+
 from .models import QueuedPrompt, QueueState, PromptStatus
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+
+# (st_mtime_ns, st_size) of a queue file: a file whose signature is unchanged
+# since it was last read is not parsed again. The size catches rewrites that
+# land within the filesystem's timestamp granularity.
+FileSignature = Tuple[int, int]
+
+# QueuedPrompt fields that parse_prompt_file fills in, as stored in the parse
+# cache; the datetimes are stored as ISO strings. The execution log is left
+# out to keep the cache small and is re-read from the file when needed.
+_PARSED_FIELDS = (
+    "id",
+    "content",
+    "working_directory",
+    "priority",
+    "context_files",
+    "max_retries",
+    "estimated_tokens",
+    "session_id",
+    "is_session_start",
+    "chat_name",
+    "output_path",
+)
+_PARSED_DATETIME_FIELDS = ("created_at", "rate_limited_at", "reset_time")
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Replace path with data so that readers see either the old or new file.
+
+    The temporary name includes the PID, since the processor and CLI commands
+    can write the same file, and does not end in .md, so queue scans skip it.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        # Written with os.write, skipping the buffered file object
+        fd = os.open(
+            tmp_path,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+            0o666,
+        )
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_bytes(path: Any) -> bytes:
+    """Read a whole file with os.read, skipping the buffered file object.
+
+    The first read asks for the whole file as sized by fstat; reading goes on
+    until EOF, so a short read or a file that grew meanwhile is still read in
+    full.
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        chunks = [os.read(fd, size)] if size else []
+        while True:
+            chunk = os.read(fd, 64 * 1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    finally:
+        os.close(fd)
+
+
+def _metadata_datetime(value: Any) -> Optional[datetime]:
+    """A frontmatter timestamp: an ISO string, or a datetime if YAML parsed one.
+
+    Aware values are converted to naive local time, like every other
+    timestamp the queue compares against.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _parsed_fields(prompt: QueuedPrompt) -> Dict:
+    fields = {name: getattr(prompt, name) for name in _PARSED_FIELDS}
+    for name in _PARSED_DATETIME_FIELDS:
+        value = getattr(prompt, name)
+        fields[name] = value.isoformat() if value else None
+    return fields
+
+
+def _prompt_from_parsed_fields(fields: Dict, path: str) -> QueuedPrompt:
+    values = {name: fields[name] for name in _PARSED_FIELDS}
+    for name in _PARSED_DATETIME_FIELDS:
+        if fields[name]:
+            values[name] = _metadata_datetime(fields[name])
+    prompt = QueuedPrompt(**values)
+    prompt._log_loader = functools.partial(_read_execution_log, path)
+    return prompt
+
+
+def _read_execution_log(path: str) -> str:
+    """The execution log section of a prompt file, or "" if it cannot be read."""
+    prompt = MarkdownPromptParser.parse_prompt_file(Path(path))
+    return prompt.execution_log if prompt else ""
+
+
+# Characters not allowed in file names on common filesystems, mapped to "-"
+_INVALID_FILENAME_CHARS = str.maketrans(dict.fromkeys('<>:"/\\|?*', "-"))
+_DASH_RUN_RE = re.compile(r"[-\s]+")
+
+# total_prompts in a chat file is padded to this width so it can be updated
+# in place; only the last _CHAT_TAIL_BYTES are checked for a duplicate entry
+_CHAT_COUNT_WIDTH = 10
+_CHAT_TAIL_BYTES = 64 * 1024
+
+# Written by `claude-queue template`; %d is the priority
+PROMPT_TEMPLATE = b"""---
+priority: %d
+working_directory: .
+context_files: []
+max_retries: 3
+estimated_tokens: null
+---
+
+# Prompt Title
+
+Write your prompt here...
+
+## Context
+Any additional context or requirements...
+
+## Expected Output
+What should be delivered...
+"""
+
+# Name suffix of the queue file of a prompt in each status kept in the queue
+_QUEUE_FILE_SUFFIXES = {
+    PromptStatus.QUEUED: ".md",
+    PromptStatus.EXECUTING: ".executing.md",
+    PromptStatus.RATE_LIMITED: ".rate-limited.md",
+}
+
+# Starts the execution log section that follows the prompt text in a prompt file
+EXECUTION_LOG_HEADER = "\n\n## Execution Log\n\n```\n"
+
 
 class MarkdownPromptParser:
     """Parser for markdown-based prompt files."""
@@ -20,25 +197,35 @@ class MarkdownPromptParser:
     def parse_prompt_file(file_path: Path) -> Optional[QueuedPrompt]:
         """Parse a markdown prompt file into a QueuedPrompt object."""
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-
+            # Decoded in one go rather than through a TextIOWrapper; newlines
+            # are normalized below as text mode would
+            content = read_bytes(file_path).decode("utf-8")
+            if "\r" in content:
+                content = content.replace("\r\n", "\n").replace("\r", "\n")
+
+            frontmatter = ""
+            body = content
             if content.startswith("---\n"):
-                parts = content.split("---\n", 2)
-                if len(parts) >= 3:
-                    frontmatter = parts[1]
-                    markdown_content = parts[2].strip()
-                else:
-                    frontmatter = ""
-                    markdown_content = content
-            else:
-                frontmatter = ""
-                markdown_content = content
+                # The closing delimiter must be a line of its own
+                end = content.find("\n---\n", 3)
+                if end != -1:
+                    frontmatter = content[4:end + 1]
+                    body = content[end + 5:]
+
+            # The log written after the prompt is not part of what Claude is sent
+            execution_log = ""
+            log_start = body.rfind(EXECUTION_LOG_HEADER)
+            if log_start != -1:
+                execution_log = body[log_start + len(EXECUTION_LOG_HEADER):].rstrip()
+                if execution_log.endswith("```"):
+                    execution_log = execution_log[:-3]
+                body = body[:log_start]
+            markdown_content = body.strip()
 
             metadata: dict = {}
-            if frontmatter.strip():
+            if frontmatter and not frontmatter.isspace():
                 try:
-                    metadata = yaml.safe_load(frontmatter) or {}
+                    metadata = yaml.load(frontmatter, Loader=_YamlLoader) or {}
                 except yaml.YAMLError:
                     metadata = {}
 
@@ -48,9 +235,16 @@ class MarkdownPromptParser:
                 else file_path.stem
             )
 
+            # Templates written by hand have no created_at; use the file's
+            # ctime for those only, since it changes on every save
+            created_at = _metadata_datetime(metadata.get("created_at"))
+            if created_at is None:
+                created_at = datetime.fromtimestamp(os.stat(file_path).st_ctime)
+
             prompt = QueuedPrompt(
                 id=prompt_id,
                 content=markdown_content,
+                execution_log=execution_log,
                 working_directory=metadata.get("working_directory", "."),
                 priority=metadata.get("priority", 0),
                 context_files=metadata.get("context_files", []),
@@ -58,7 +252,12 @@ class MarkdownPromptParser:
                 estimated_tokens=metadata.get("estimated_tokens"),
                 session_id=metadata.get("session_id"),
                 is_session_start=metadata.get("is_session_start", False),
-                created_at=datetime.fromtimestamp(file_path.stat().st_ctime),
+                chat_name=metadata.get("chat_name"),
+                created_at=created_at,
+                # Needed to know when a rate-limited prompt may be retried
+                rate_limited_at=_metadata_datetime(metadata.get("rate_limited_at")),
+                reset_time=_metadata_datetime(metadata.get("reset_time")),
+                output_path=metadata.get("output_path"),
             )
 
             return prompt
@@ -88,25 +287,28 @@ class MarkdownPromptParser:
                 metadata["session_id"] = prompt.session_id
             if prompt.is_session_start:
                 metadata["is_session_start"] = prompt.is_session_start
+            if prompt.chat_name:
+                metadata["chat_name"] = prompt.chat_name
             if prompt.last_executed:
                 metadata["last_executed"] = prompt.last_executed.isoformat()
             if prompt.rate_limited_at:
                 metadata["rate_limited_at"] = prompt.rate_limited_at.isoformat()
             if prompt.reset_time:
                 metadata["reset_time"] = prompt.reset_time.isoformat()
-
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write("---\n")
-                yaml.dump(metadata, f, default_flow_style=False)
-                f.write("---\n\n")
-                f.write(prompt.content)
-
-                if prompt.execution_log:
-                    f.write("\n\n## Execution Log\n\n")
-                    f.write("```\n")
-                    f.write(prompt.execution_log)
-                    f.write("```\n")
-
+            if prompt.output_path:
+                metadata["output_path"] = prompt.output_path
+
+            parts = [
+                "---\n",
+                yaml.dump(metadata, Dumper=_YamlDumper, default_flow_style=False),
+                "---\n\n",
+                prompt.content,
+            ]
+            execution_log = prompt.render_log()
+            if execution_log:
+                parts += [EXECUTION_LOG_HEADER, execution_log, "```\n"]
+
+            atomic_write(file_path, "".join(parts).encode("utf-8"))
             return True
 
         except Exception as e:
@@ -116,8 +318,11 @@ class MarkdownPromptParser:
     @staticmethod
     def get_base_filename(prompt: QueuedPrompt) -> str:
         """Get the base filename for a prompt (id and sanitized title, no status suffix)."""
-        sanitized_title = QueueStorage._sanitize_filename_static(prompt.content[:50])
-        return f"{prompt.id}-{sanitized_title}.md"
+        # Neither id nor content changes once a prompt exists; sanitize once
+        if prompt._base_filename is None:
+            sanitized_title = QueueStorage._sanitize_filename_static(prompt.content[:50])
+            prompt._base_filename = f"{prompt.id}-{sanitized_title}.md"
+        return prompt._base_filename
 
 
 class QueueStorage:
@@ -129,9 +334,22 @@ class QueueStorage:
         self.completed_dir = self.base_dir / "completed"
         self.failed_dir = self.base_dir / "failed"
         self.chats_dir = self.base_dir / "chats"
+        self.output_dir = self.base_dir / "output"
         self.state_file = self.base_dir / "queue-state.json"
-
-        for dir_path in [self.queue_dir, self.completed_dir, self.failed_dir, self.chats_dir]:
+        # Counters last read from or written to state_file by this process
+        self._saved_counters: Optional[Tuple] = None
+        self.connection_check_file = self.base_dir / ".connection_ok"
+        # Parsed fields of queue files by path and FileSignature, so a full
+        # load only parses the files that changed since the last one
+        self.parse_cache_file = self.base_dir / ".parse_cache.json"
+
+        for dir_path in [
+            self.queue_dir,
+            self.completed_dir,
+            self.failed_dir,
+            self.chats_dir,
+            self.output_dir,
+        ]:
             dir_path.mkdir(parents=True, exist_ok=True)
 
         self.parser = MarkdownPromptParser()
@@ -141,12 +359,11 @@ class QueueStorage:
 
     def load_queue_state(self) -> QueueState:
         """Load queue state from storage."""
-        state = QueueState()
+        state = QueueState(prompts=self._load_prompts_from_files())
 
         if self.state_file.exists():
             try:
-                with open(self.state_file, "r") as f:
-                    data = json.load(f)
+                data = _json_loads(read_bytes(self.state_file))
 
                 state.total_processed = data.get("total_processed", 0)
                 state.failed_count = data.get("failed_count", 0)
@@ -157,17 +374,38 @@ class QueueStorage:
                         data["last_processed"]
                     )
 
+                self._saved_counters = self._state_counters(state)
+
             except Exception as e:
                 print(f"Error loading queue state: {e}")
 
-        state.prompts = self._load_prompts_from_files()
-
         return state
 
-    def save_queue_state(self, state: QueueState) -> bool:
-        """Save queue state to storage."""
+    @staticmethod
+    def _state_counters(state: QueueState) -> Tuple:
+        """The values of a QueueState that are stored in state_file."""
+        return (
+            state.total_processed,
+            state.failed_count,
+            state.rate_limited_count,
+            state.last_processed,
+        )
+
+    def save_queue_state(
+        self, state: QueueState, prompts: Optional[Iterable[QueuedPrompt]] = None
+    ) -> bool:
+        """Save queue state to storage.
+
+        When `prompts` is given only those prompt files are rewritten;
+        otherwise every prompt in the state is.
+        """
         try:
-            self._save_prompts_to_files(state.prompts)
+            self._save_prompts_to_files(state.prompts if prompts is None else prompts)
+
+            # Most saves only touch prompt files; leave the state file alone then
+            counters = self._state_counters(state)
+            if counters == self._saved_counters:
+                return True
 
             state_data = {
                 "total_processed": state.total_processed,
@@ -179,8 +417,8 @@ class QueueStorage:
                 "updated_at": datetime.now().isoformat(),
             }
 
-            with open(self.state_file, "w") as f:
-                json.dump(state_data, f, indent=2)
+            atomic_write(self.state_file, _json_dumps(state_data))
+            self._saved_counters = counters
 
             return True
 
@@ -188,145 +426,258 @@ class QueueStorage:
             print(f"Error saving queue state: {e}")
             return False
 
-    def _load_prompts_from_files(self) -> List[QueuedPrompt]:
-        """Load all prompts from markdown files."""
-        prompts = []
-        processed_ids = set()
-
-        for file_path in self.queue_dir.glob("*.executing.md"):
-            prompt = self.parser.parse_prompt_file(file_path)
-            if prompt:
-                prompt.status = PromptStatus.EXECUTING
-                prompts.append(prompt)
-                processed_ids.add(prompt.id)
-
-        for file_path in self.queue_dir.glob("*.rate-limited.md"):
-            prompt = self.parser.parse_prompt_file(file_path)
-            if prompt:
-                prompt.status = PromptStatus.RATE_LIMITED
-                prompts.append(prompt)
-                processed_ids.add(prompt.id)
-
-        for file_path in self.queue_dir.glob("*.md"):
-            if (
-                file_path.name.endswith(".executing.md")
-                or file_path.name.endswith(".rate-limited.md")
-                or "#" in file_path.name
-            ):
-                continue
+    def load_connection_check(self) -> Optional[Dict]:
+        """Load the record of the last successful Claude CLI connection test."""
+        try:
+            return _json_loads(read_bytes(self.connection_check_file))
+        except (OSError, ValueError):
+            return None
 
-            prompt = self.parser.parse_prompt_file(file_path)
-            if prompt and prompt.id not in processed_ids:
-                prompt.status = PromptStatus.QUEUED
-                prompts.append(prompt)
+    def save_connection_check(self, record: Dict) -> None:
+        """Record a successful Claude CLI connection test."""
+        try:
+            atomic_write(self.connection_check_file, _json_dumps(record))
+        except OSError as e:
+            print(f"Warning: could not save connection check: {e}")
 
+    def clear_connection_check(self) -> None:
+        """Forget the last connection test so the next start probes again."""
+        try:
+            self.connection_check_file.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _load_prompts_from_files(self) -> List[QueuedPrompt]:
+        """Load all prompts from markdown files, reusing the parse cache."""
+        cache = self._load_parse_cache()
+        cached = dict(cache)
+        prompts, _, current_files = self.load_changes_since({}, cache)
+
+        for path in list(cache):
+            if path not in current_files:
+                del cache[path]
+        if cache != cached:
+            self._save_parse_cache(cache)
         return prompts
 
-    def _save_prompts_to_files(self, prompts: List[QueuedPrompt]) -> None:
+    def _load_parse_cache(self) -> Dict[str, Dict]:
+        try:
+            cache = _json_loads(read_bytes(self.parse_cache_file))
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    def _save_parse_cache(self, cache: Dict[str, Dict]) -> None:
+        try:
+            atomic_write(self.parse_cache_file, _json_dumps(cache))
+        except (OSError, TypeError) as e:
+            print(f"Warning: could not save parse cache: {e}")
+
+    def _parse_queue_file(
+        self, path: str, signature: FileSignature, cache: Optional[Dict[str, Dict]]
+    ) -> Optional[QueuedPrompt]:
+        """Parse a queue file, or rebuild it from cache if the file is unchanged.
+
+        cache (path -> {"signature", "fields"}) is updated with the result.
+        """
+        if cache is None:
+            return self.parser.parse_prompt_file(Path(path))
+
+        entry = cache.get(path)
+        if entry is not None and tuple(entry.get("signature", ())) == signature:
+            try:
+                return _prompt_from_parsed_fields(entry["fields"], path)
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        prompt = self.parser.parse_prompt_file(Path(path))
+        if prompt:
+            cache[path] = {"signature": list(signature), "fields": _parsed_fields(prompt)}
+        else:
+            cache.pop(path, None)
+        return prompt
+
+    @staticmethod
+    def _status_from_filename(name: str) -> Optional[PromptStatus]:
+        """Status implied by a queue file name, or None if it is not a prompt file."""
+        if name.endswith(".executing.md"):
+            return PromptStatus.EXECUTING
+        if name.endswith(".rate-limited.md"):
+            return PromptStatus.RATE_LIMITED
+        if name.endswith(".md") and "#" not in name:
+            return PromptStatus.QUEUED
+        return None
+
+    @staticmethod
+    def prompt_id_from_filename(name: str) -> str:
+        """Prompt ID encoded in a prompt file name (same rule as the parser)."""
+        return name[: -len(".md")].split("-", 1)[0]
+
+    def scan_queue_files(self) -> Dict[str, FileSignature]:
+        """Map the path of every prompt file in the queue directory to its signature."""
+        files = {}
+        with os.scandir(self.queue_dir) as entries:
+            for entry in entries:
+                if self._status_from_filename(entry.name) is not None:
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def load_changes_since(
+        self,
+        known_files: Dict[str, FileSignature],
+        parse_cache: Optional[Dict[str, Dict]] = None,
+    ) -> Tuple[List[QueuedPrompt], Set[str], Dict[str, FileSignature]]:
+        """Parse queue files that are new or modified compared to known_files.
+
+        Returns the parsed prompts, the IDs of every prompt that still has a file
+        in the queue directory, and the current path -> signature map. Files
+        unchanged since they were recorded in parse_cache are not re-read.
+        """
+        current_files = self.scan_queue_files()
+        present_ids = set()
+        special_ids = set()
+        changed_paths = []
+
+        for path, signature in current_files.items():
+            name = os.path.basename(path)
+            prompt_id = self.prompt_id_from_filename(name)
+            present_ids.add(prompt_id)
+            status = self._status_from_filename(name)
+            if status != PromptStatus.QUEUED:
+                special_ids.add(prompt_id)
+            if known_files.get(path) != signature:
+                changed_paths.append((path, prompt_id, status))
+
+        changed = []
+        for path, prompt_id, status in changed_paths:
+            # Executing and rate-limited files take precedence, as in a full
+            # load; a plain file shadowed by one is not even read
+            if status == PromptStatus.QUEUED and prompt_id in special_ids:
+                continue
+            prompt = self._parse_queue_file(path, current_files[path], parse_cache)
+            if not prompt:
+                continue
+            prompt.status = status
+            changed.append(prompt)
+
+        return changed, present_ids, current_files
+
+    def _save_prompts_to_files(self, prompts: Iterable[QueuedPrompt]) -> None:
         """Save prompts to appropriate directories based on status."""
+        queue_files = None
         for prompt in prompts:
-            self._save_single_prompt(prompt)
-
-    def _save_single_prompt(self, prompt: QueuedPrompt) -> bool:
-        """Save a single prompt to the appropriate location."""
+            # The queue directory is listed once, on the first save, for all prompts
+            if queue_files is None:
+                queue_files = self._queue_files_by_id()
+            self._save_single_prompt(prompt, queue_files)
+
+    def _save_single_prompt(
+        self, prompt: QueuedPrompt, queue_files: Dict[str, List[str]]
+    ) -> bool:
+        """Save a single prompt to the appropriate location.
+
+        Its old files are taken out of queue_files (see _queue_files_by_id)
+        and removed.
+        """
         try:
             base_filename = MarkdownPromptParser.get_base_filename(prompt)
-            if prompt.status == PromptStatus.COMPLETED:
-                self._remove_prompt_files(prompt.id, self.queue_dir)
-                if prompt.session_id:
-                    chat_name = self._get_chat_name_from_session(prompt.session_id)
-                    self.append_to_chat_file(prompt, chat_name)
-                    return True
-                target_dir = self.completed_dir
-            elif prompt.status == PromptStatus.FAILED:
-                target_dir = self.failed_dir
-                self._remove_prompt_files(prompt.id, self.queue_dir)
+            suffix = _QUEUE_FILE_SUFFIXES.get(prompt.status)
+            if suffix is not None:
+                file_path = self.queue_dir / (base_filename[: -len(".md")] + suffix)
             elif prompt.status == PromptStatus.CANCELLED:
-                target_dir = self.failed_dir
-                base_filename = f"{prompt.id}-cancelled.md"
-                self._remove_prompt_files(prompt.id, self.queue_dir)
-            elif prompt.status == PromptStatus.EXECUTING:
-                target_dir = self.queue_dir
-                base_filename = base_filename.replace(".md", ".executing.md")
-                self._remove_prompt_files(prompt.id, self.queue_dir)
-            elif prompt.status == PromptStatus.RATE_LIMITED:
-                target_dir = self.queue_dir
-                base_filename = base_filename.replace(".md", ".rate-limited.md")
-                self._remove_prompt_files(prompt.id, self.queue_dir)
-            else:  # QUEUED
-                target_dir = self.queue_dir
-            file_path = target_dir / base_filename
+                file_path = self.failed_dir / f"{prompt.id}-cancelled.md"
+            elif prompt.status == PromptStatus.FAILED:
+                file_path = self.failed_dir / base_filename
+            else:  # COMPLETED
+                file_path = self.completed_dir / base_filename
+
+            # Any other queue file of the prompt is stale now, e.g. the
+            # .executing.md of a prompt that finished or was requeued; a log
+            # not read from it yet is loaded first
+            prompt.render_log()
+            self._remove_prompt_files(prompt.id, queue_files, keep=str(file_path))
+
+            if prompt.status == PromptStatus.COMPLETED and prompt.session_id:
+                chat_name = self._get_chat_name_from_session(prompt.session_id)
+                if self.append_to_chat_file(prompt, chat_name):
+                    self._move_prompt_output(prompt, None)
+                return True
+            if suffix is None:
+                # A cancelled prompt's output goes; a finished one's is kept
+                # next to its prompt file
+                self._move_prompt_output(
+                    prompt,
+                    None if prompt.status == PromptStatus.CANCELLED
+                    else file_path.with_suffix(".log"),
+                )
             return self.parser.write_prompt_file(prompt, file_path)
         except Exception as e:
             print(f"Error saving prompt {prompt.id}: {e}")
             return False
 
-    def _remove_prompt_files(self, prompt_id: str, directory: Path) -> None:
-        """Remove all files for a prompt ID from a directory, including any status suffixes."""
-        patterns = [
-            f"{prompt_id}.md",
-            f"{prompt_id}*.md",
-        ]
-        for pattern in patterns:
-            for file_path in directory.glob(pattern):
-                try:
-                    file_path.unlink()
-                except Exception as e:
-                    print(f"Error removing file {file_path}: {e}")
-        for file_path in directory.glob(f"{prompt_id}-#*.md"):
+    @staticmethod
+    def _move_prompt_output(prompt: QueuedPrompt, target: Optional[Path]) -> None:
+        """Move the output file of a prompt that left the queue to target.
+
+        With no target the file is deleted. output_dir thus only holds the
+        output of prompts still in the queue.
+        """
+        if not prompt.output_path or prompt.output_path == str(target):
+            return
+        try:
+            if target is None:
+                os.unlink(prompt.output_path)
+            else:
+                os.replace(prompt.output_path, target)
+        except FileNotFoundError:
+            target = None
+        except OSError as e:
+            print(f"Warning: could not move output of prompt {prompt.id}: {e}")
+            return
+        prompt.output_path = str(target) if target else None
+
+    def _queue_files_by_id(self) -> Dict[str, List[str]]:
+        """Map each prompt ID to the paths of its files in the queue directory."""
+        queue_files: Dict[str, List[str]] = {}
+        with os.scandir(self.queue_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".md"):
+                    prompt_id = self.prompt_id_from_filename(entry.name)
+                    queue_files.setdefault(prompt_id, []).append(entry.path)
+        return queue_files
+
+    def _remove_prompt_files(
+        self, prompt_id: str, queue_files: Dict[str, List[str]], keep: Optional[str] = None
+    ) -> None:
+        """Remove all queue files for a prompt ID, including any status suffixes.
+
+        keep, the file about to be rewritten, is left for the atomic replace.
+        """
+        for path in queue_files.pop(prompt_id, ()):
+            if path == keep:
+                continue
             try:
-                file_path.unlink()
-            except Exception as e:
-                print(f"Error removing processed file {file_path}: {e}")
+                os.unlink(path)
+            except OSError as e:
+                print(f"Error removing file {path}: {e}")
 
     @staticmethod
     def _sanitize_filename_static(text: str) -> str:
         """Sanitize text for use in filename (static version for use in parser)."""
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            text = text.replace(char, "-")
-
-        text = re.sub(r"[-\s]+", "-", text)
-        text = text.strip("-")
-        return text[:50]
+        text = _DASH_RUN_RE.sub("-", text.translate(_INVALID_FILENAME_CHARS))
+        return text.strip("-")[:50]
 
     def create_prompt_template(self, filename: str, priority: int = 0) -> Path:
         """Create a prompt template file."""
-        template_content = f"""---
-priority: {priority}
-working_directory: .
-context_files: []
-max_retries: 3
-estimated_tokens: null
----
-
-# Prompt Title
-
-Write your prompt here...
-
-## Context
-Any additional context or requirements...
-
-## Expected Output
-What should be delivered...
-"""
-
         file_path = self.queue_dir / f"{filename}.md"
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(template_content)
+        file_path.write_bytes(PROMPT_TEMPLATE % priority)
 
         return file_path
 
-    def _get_chat_name_from_session(self, session_id: str) -> str:
+    def _get_chat_name_from_session(self, session_id: str) -> Optional[str]:
         """Get chat name from session ID using ChatSessionManager."""
-        try:
-            chats = self.chat_sessions.list_chat_sessions()
-            for chat in chats:
-                if chat['session_id'] == session_id:
-                    return chat['chat_name']
-        except Exception:
-            pass
-        return None
+        return self.chat_sessions.get_chat_name(session_id)
 
     def append_to_chat_file(self, prompt: QueuedPrompt, chat_name: str = None) -> bool:
         """Append a completed prompt to its chat file."""
@@ -335,6 +686,9 @@ What should be delivered...
                 return False
 
             session_file = self.chats_dir / f"{prompt.session_id}.md"
+            executed_time = prompt.last_executed or datetime.now()
+            entry_header = f"## Prompt - {executed_time.strftime('%Y-%m-%d %H:%M:%S')}"
+            user_line = f"**User:** {prompt.content}"
 
             if not session_file.exists():
                 metadata = f"""---
@@ -342,7 +696,7 @@ session_id: {prompt.session_id}
 chat_name: {chat_name or 'unnamed'}
 created_at: '{datetime.now().isoformat()}'
 working_directory: {prompt.working_directory}
-total_prompts: 0
+total_prompts: {0:<{_CHAT_COUNT_WIDTH}}
 ---
 
 # Chat: {chat_name or prompt.session_id}
@@ -350,36 +704,95 @@ total_prompts: 0
 """
                 with open(session_file, "w", encoding="utf-8") as f:
                     f.write(metadata)
-            else:
-                with open(session_file, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    if f"## Prompt - {prompt.last_executed.strftime('%Y-%m-%d %H:%M:%S')}" in content and f"**User:** {prompt.content}" in content:
-                        return True
+            elif self._chat_tail_contains(session_file, entry_header, user_line):
+                return True
 
             with open(session_file, "a", encoding="utf-8") as f:
-                executed_time = prompt.last_executed or datetime.now()
-                f.write(f"\n## Prompt - {executed_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"**User:** {prompt.content}\n\n")
+                f.write(f"\n{entry_header}\n")
+                f.write(f"{user_line}\n\n")
 
-                if prompt.execution_log:
+                # Without a saved output file, fall back to the execution log
+                if not self._copy_prompt_output(prompt, f) and prompt.render_log():
                     output_lines = prompt.execution_log.split('\n')
-                    for line in output_lines:
-                        if line.startswith('[') and 'Output:' in line:
-                            idx = output_lines.index(line)
-                            if idx + 1 < len(output_lines):
-                                response = '\n'.join(output_lines[idx+1:])
-                                f.write(f"**Claude:**\n{response}\n")
-                                break
+                    idx = next(
+                        (
+                            i
+                            for i, line in enumerate(output_lines)
+                            if line.startswith('[') and 'Output:' in line
+                        ),
+                        None,
+                    )
+                    if idx is not None and idx + 1 < len(output_lines):
+                        response = '\n'.join(output_lines[idx+1:])
+                        f.write(f"**Claude:**\n{response}\n")
 
                 f.write("\n---\n")
 
-            self._update_chat_metadata(session_file)
+            self._increment_chat_prompt_count(session_file)
             return True
 
         except Exception as e:
             print(f"Error appending to chat file: {e}")
             return False
 
+    @staticmethod
+    def _copy_prompt_output(prompt: QueuedPrompt, chat: Any) -> bool:
+        """Append the full output of a prompt's last run to an open chat file.
+
+        The output is copied in chunks, so memory use does not depend on its
+        size. Returns False if the output was not saved to a file.
+        """
+        if not prompt.output_path:
+            return False
+        try:
+            output = open(prompt.output_path, "r", encoding="utf-8", errors="replace")
+        except OSError:
+            return False
+        with output:
+            chat.write("**Claude:**\n")
+            shutil.copyfileobj(output, chat)
+            chat.write("\n")
+        return True
+
+    @staticmethod
+    def _chat_tail_contains(chat_file: Path, *texts: str) -> bool:
+        """Check whether the end of a chat file contains all of texts.
+
+        A prompt appended again would match the last entry, so only the last
+        _CHAT_TAIL_BYTES are read rather than the whole transcript.
+        """
+        with open(chat_file, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(size - _CHAT_TAIL_BYTES, 0))
+            tail = f.read().decode("utf-8", errors="replace")
+        return all(text in tail for text in texts)
+
+    def _increment_chat_prompt_count(self, chat_file: Path) -> None:
+        """Add one to total_prompts by overwriting the fixed-width field in place.
+
+        Chat files written before the field was padded get a full rewrite
+        through _update_chat_metadata, which also pads it.
+        """
+        try:
+            with open(chat_file, "r+b") as f:
+                head = f.read(4096)
+                start = head.find(b"\ntotal_prompts: ")
+                if start != -1:
+                    start += len(b"\ntotal_prompts: ")
+                    end = head.find(b"\n", start)
+                    field = head[start:end]
+                    if end != -1 and len(field) == _CHAT_COUNT_WIDTH and field.strip().isdigit():
+                        count = str(int(field) + 1).ljust(_CHAT_COUNT_WIDTH).encode()
+                        if len(count) == _CHAT_COUNT_WIDTH:
+                            f.seek(start)
+                            f.write(count)
+                            return
+        except OSError as e:
+            print(f"Error updating chat metadata: {e}")
+            return
+
+        self._update_chat_metadata(chat_file)
+
     def _update_chat_metadata(self, chat_file: Path) -> None:
         """Update total_prompts count in chat file metadata."""
         try:
@@ -397,7 +810,9 @@ total_prompts: 0
 
                     for line in metadata_lines:
                         if line.startswith('total_prompts:'):
-                            new_metadata_lines.append(f"total_prompts: {prompt_count}")
+                            new_metadata_lines.append(
+                                f"total_prompts: {prompt_count:<{_CHAT_COUNT_WIDTH}}"
+                            )
                         else:
                             new_metadata_lines.append(line)
 
@@ -0,0 +1,179 @@
+"""
+Wait for changes to the queue directory without polling.
+Uses inotify on Linux and watchdog (if installed) elsewhere.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import selectors
+import sys
+from pathlib import Path
+from typing import Optional
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - optional dependency
+    FileSystemEventHandler = object
+    Observer = None
+
+
+# inotify(7) event masks: anything that adds, removes or rewrites a prompt file.
+# IN_CREATE is left out on purpose: a new file is only worth reading once the
+# writer has closed it (IN_CLOSE_WRITE).
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+
+class _PipeNotifier(FileSystemEventHandler):
+    """Forwards watchdog events to the watcher's selector through a pipe."""
+
+    def __init__(self, write_fd: int):
+        super().__init__()
+        self.write_fd = write_fd
+
+    def on_any_event(self, event) -> None:
+        _poke(self.write_fd)
+
+
+def _poke(fd: int) -> None:
+    """Write a byte to a non-blocking pipe, ignoring a full or closed pipe."""
+    try:
+        os.write(fd, b"\0")
+    except OSError:
+        pass
+
+
+def _drain(fd: int) -> None:
+    """Read everything pending on a non-blocking fd."""
+    try:
+        while os.read(fd, 4096):
+            pass
+    except OSError:
+        pass
+
+
+def _nonblocking_pipe():
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    return read_fd, write_fd
+
+
+class QueueWatcher:
+    """Blocks until the queue directory changes, a timeout expires or wake() is called.
+
+    Without inotify or watchdog it falls back to checking the directory mtime
+    every poll_interval seconds.
+    """
+
+    def __init__(self, directory: Path, poll_interval: float):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._selector = selectors.DefaultSelector()
+        self._observer = None
+        self._events_fd: Optional[int] = None
+        self._events_write_fd: Optional[int] = None
+
+        # Self-pipe so a signal handler can interrupt a blocking wait()
+        self._wake_fd, self._wake_write_fd = _nonblocking_pipe()
+        self._selector.register(self._wake_fd, selectors.EVENT_READ)
+
+        self._events_fd = self._start_inotify()
+        if self._events_fd is None and Observer is not None:
+            self._events_fd = self._start_watchdog()
+        if self._events_fd is not None:
+            self._selector.register(self._events_fd, selectors.EVENT_READ)
+
+    @property
+    def is_polling(self) -> bool:
+        return self._events_fd is None
+
+    def _start_inotify(self) -> Optional[int]:
+        """Return a non-blocking inotify fd watching the directory, or None."""
+        if not sys.platform.startswith("linux"):
+            return None
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        if libc.inotify_add_watch(fd, os.fsencode(str(self.directory)), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _start_watchdog(self) -> Optional[int]:
+        """Start a watchdog observer that pokes a pipe on every event."""
+        read_fd, write_fd = _nonblocking_pipe()
+        try:
+            observer = Observer()
+            observer.schedule(_PipeNotifier(write_fd), str(self.directory), recursive=False)
+            observer.start()
+        except Exception:
+            os.close(read_fd)
+            os.close(write_fd)
+            return None
+
+        self._observer = observer
+        self._events_write_fd = write_fd
+        return read_fd
+
+    def wake(self) -> None:
+        """Make a pending or upcoming wait() return immediately. Signal-safe."""
+        if self._wake_write_fd is not None:
+            _poke(self._wake_write_fd)
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds. Returns True if the directory changed."""
+        if self.is_polling:
+            return self._poll(timeout)
+
+        changed = False
+        for key, _ in self._selector.select(max(timeout, 0)):
+            _drain(key.fd)
+            if key.fd == self._events_fd:
+                changed = True
+        return changed
+
+    def _poll(self, timeout: float) -> bool:
+        """Fallback wait: compare the directory mtime every poll_interval."""
+        start_mtime = self._dir_mtime()
+        remaining = max(timeout, 0)
+        while remaining > 0:
+            interval = min(remaining, self.poll_interval)
+            if self._selector.select(interval):
+                _drain(self._wake_fd)
+                return False
+            remaining -= interval
+            if self._dir_mtime() != start_mtime:
+                return True
+        return False
+
+    def _dir_mtime(self) -> int:
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return 0
+
+    def close(self) -> None:
+        """Stop watching and release file descriptors."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+        self._selector.close()
+        for fd in (self._events_fd, self._events_write_fd, self._wake_fd, self._wake_write_fd):
+            if fd is not None:
+                os.close(fd)
+        self._events_fd = self._events_write_fd = None
+        self._wake_fd = self._wake_write_fd = None
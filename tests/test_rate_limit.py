@@ -0,0 +1,72 @@
+"""
+Tests for rate-limit reset times reported as timezone-aware ISO timestamps.
+"""
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from claude_code_queue.claude_interface import ClaudeCodeInterface
+from claude_code_queue.models import PromptStatus, QueuedPrompt
+from claude_code_queue.queue_manager import QueueManager
+from claude_code_queue.storage import QueueStorage
+
+LIMIT_MESSAGE = "Claude usage limit reached at 2026-10-15T10:00:00Z"
+
+
+class AwareResetTimeTest(unittest.TestCase):
+    def setUp(self):
+        interface = ClaudeCodeInterface(verify=False)
+        self.info = interface._detect_rate_limit(LIMIT_MESSAGE)
+
+    def test_reset_time_is_naive_local(self):
+        expected = (
+            datetime(2026, 10, 15, 10, tzinfo=timezone.utc).astimezone()
+            + timedelta(hours=5)
+        ).replace(tzinfo=None)
+        self.assertTrue(self.info.is_rate_limited)
+        self.assertEqual(self.info.reset_time, expected)
+
+    def test_track_rate_limit(self):
+        manager = QueueManager.__new__(QueueManager)
+        manager._rate_limit_heap = []
+        prompt = QueuedPrompt(
+            status=PromptStatus.RATE_LIMITED,
+            rate_limited_at=datetime.now(),
+            reset_time=self.info.reset_time,
+        )
+        manager._track_rate_limit(prompt, datetime.now())
+        self.assertEqual(len(manager._rate_limit_heap), 1)
+        prompt.should_execute_now()
+
+    def test_save_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            storage = QueueStorage(base_dir)
+            prompt = QueuedPrompt(
+                content="retry me",
+                status=PromptStatus.RATE_LIMITED,
+                rate_limited_at=datetime.now(),
+                reset_time=self.info.reset_time,
+            )
+            state = storage.load_queue_state()
+            state.add_prompt(prompt)
+            self.assertTrue(storage.save_queue_state(state))
+
+            loaded = QueueStorage(base_dir).load_queue_state().get_prompt(prompt.id)
+            self.assertEqual(loaded.reset_time, self.info.reset_time)
+            storage.chat_sessions.close()
+
+    def test_load_aware_frontmatter(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            storage = QueueStorage(base_dir)
+            (storage.queue_dir / "abc123-retry.rate-limited.md").write_text(
+                "---\nreset_time: '2026-10-15T10:00:00Z'\n---\n\nretry me\n"
+            )
+            loaded = storage.load_queue_state().get_prompt("abc123")
+            self.assertIsNone(loaded.reset_time.tzinfo)
+            loaded.should_execute_now()
+            storage.chat_sessions.close()
+
+
+if __name__ == "__main__":
+    unittest.main()